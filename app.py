@@ -1,13 +1,17 @@
 import streamlit as st
 import os
+import asyncio
+import time
 from dotenv import load_dotenv
-import json
-from datetime import datetime
-import concurrent.futures
-import requests
+import hashlib
+from pathlib import Path
+import httpx
+import pandas as pd
+import altair as alt
 
-from openrouter_client import OpenRouterClient
-from processors import MarkdownProcessor, PromptGenerator, REASONING_MODELS, FINAL_MODEL, MEMO_SECTIONS, get_model_display_name
+from openrouter_client import OpenRouterClient, pooled_http_client
+from response_cache import ResponseCache, DEFAULT_CACHE_DIR
+from processors import MarkdownProcessor, PromptGenerator, REASONING_MODELS, FINAL_TIMING_KEY, MEMO_SECTIONS, get_model_display_name
 from storage import LocalStorage
 
 # Load environment variables
@@ -16,9 +20,6 @@ load_dotenv()
 # Load API key from environment variables
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-# Initialize components
-storage = LocalStorage()
-
 # Set page configuration
 st.set_page_config(
     page_title="Investment Memo AI Tools",
@@ -26,6 +27,14 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_storage() -> LocalStorage:
+    """Open the results database once and share it across reruns"""
+    return LocalStorage()
+
+# Initialize components once per server process; the script body re-executes on every rerun
+storage = get_storage()
+
 def format_time(seconds):
     """Format time in seconds to a readable format"""
     if seconds < 60:
@@ -35,22 +44,145 @@ def format_time(seconds):
         seconds = seconds % 60
         return f"{minutes} min {seconds:.2f} sec"
 
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """
+    One pooled sync HTTP client for the connection test and any synchronous OpenRouter calls;
+    model calls run on an async client that each run opens and closes with its own event loop
+    """
+    return pooled_http_client()
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Responses kept on disk, shared with the CLI, so identical calls skip the network across restarts"""
+    return ResponseCache(cache_dir=DEFAULT_CACHE_DIR)
+
+@st.cache_resource
+def get_client(api_key: str) -> OpenRouterClient:
+    """Build one OpenRouter client per API key on top of the shared sync client and response cache"""
+    return OpenRouterClient(api_key, http_client=get_http_client(), cache=get_response_cache())
+
+@st.cache_resource
+def get_processor(api_key: str) -> MarkdownProcessor:
+    """Reuse the memo processor across reruns"""
+    return MarkdownProcessor(get_client(api_key))
+
+@st.cache_resource
+def get_prompt_generator(api_key: str) -> PromptGenerator:
+    """Reuse the prompt generator across reruns"""
+    return PromptGenerator(get_client(api_key))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def probe_openrouter() -> int:
+    """HEAD request to the OpenRouter API over the shared pool; the status is reused for a minute"""
+    return get_http_client().head("https://openrouter.ai/api/v1/models", timeout=5.0).status_code
+
+@st.cache_data(show_spinner=False)
+def decode_upload(data: bytes) -> str:
+    """Decode an uploaded file once per unique content instead of on every rerun"""
+    return data.decode("utf-8")
+
+def timing_chart(sorted_models) -> alt.Chart:
+    """Bar chart of (model, seconds) pairs in the given order; st.bar_chart would sort the models by name"""
+    data = pd.DataFrame(sorted_models, columns=["model", "seconds"])
+    return alt.Chart(data).mark_bar().encode(
+        x=alt.X("model:N", sort=None, title=None),
+        y=alt.Y("seconds:Q", title="Seconds")
+    )
+
 def main():
     st.title("Investment Memo AI Tools")
     st.markdown("""
     AI-powered tools for investment memo analysis and prompt generation.
     """)
     
+    # Initialize every session key once so the tabs can read them directly
+    state = st.session_state
+    state.setdefault("memo_original_text", "")
+    state.setdefault("memo_model_outputs", {})
+    state.setdefault("memo_processing_times", {})
+    state.setdefault("memo_final_output", "")
+    state.setdefault("memo_consensus_model", None)
+    state.setdefault("prompt_original_text", "")
+    state.setdefault("prompt_model_outputs", {})
+    state.setdefault("prompt_processing_times", {})
+    state.setdefault("prompt_final_output", "")
+    state.setdefault("prompt_general_prompt", "")
+    state.setdefault("prompt_section_instructions", "")
+    
+    # Settings shared by both tools
+    with st.sidebar:
+        st.header("Settings")
+        
+        # API Key input (use env var by default, allow override)
+        api_key_input = st.text_input("OpenRouter API Key (optional if set in .env)", value="", type="password", key="api_key", help="Leave empty to use API key from .env file")
+        api_key = api_key_input if api_key_input else OPENROUTER_API_KEY
+    
     # Create tabs
     tab1, tab2 = st.tabs(["📝 Memo Editor", "🎯 Prompt Generator"])
     
     with tab1:
-        memo_editor_tab()
+        memo_editor_tab(api_key)
     
     with tab2:
-        prompt_generator_tab()
+        prompt_generator_tab(api_key)
+
+@st.fragment
+def render_memo_outputs(section_type):
+    """Render the memo output panel; widget clicks inside it rerun only this fragment"""
+    state = st.session_state
+    if state.memo_model_outputs:
+        # Display section type if available
+        st.info(f"Section type: {section_type}")
+            
+        # Create tabs for outputs
+        tab_names = ["Final Output"] + [get_model_display_name(model) for model in state.memo_model_outputs.keys()]
+        tabs = st.tabs(tab_names)
+        
+        # Display final output
+        with tabs[0]:
+            if state.memo_consensus_model:
+                # The final model was skipped, so there is no final processing time
+                st.info(f"Most models agreed; this is the output of {get_model_display_name(state.memo_consensus_model)}")
+            else:
+                final_time = state.memo_processing_times.get(FINAL_TIMING_KEY, 0)
+                st.info(f"Processing time: {format_time(final_time)}")
+            st.markdown(state.memo_final_output)
+            if st.button("Save to File", key="memo_save_final"):
+                # Name the file after its content so saving the same output twice reuses one file
+                data = state.memo_final_output.encode("utf-8")
+                filename = f"edited_memo_{hashlib.blake2b(data, digest_size=8).hexdigest()}.md"
+                Path(filename).write_bytes(data)
+                st.success(f"Saved to {filename}")
+        
+        # Display model outputs with timing
+        for i, model in enumerate(state.memo_model_outputs.keys(), 1):
+            with tabs[i]:
+                # Show processing time for this model
+                model_time = state.memo_processing_times.get(model, 0)
+                st.info(f"Processing time: {format_time(model_time)}")
+                st.markdown(state.memo_model_outputs[model])
+        
+        # Show timing comparison for all models
+        st.header("Performance Comparison")
+        times = state.memo_processing_times
+        if times:
+            # Sort models by processing time
+            sorted_models = sorted(times.items(), key=lambda x: x[1])
+            
+            # Create a bar chart for timing comparison, fastest first
+            st.altair_chart(timing_chart(sorted_models), use_container_width=True)
+            
+            # Display fastest and slowest model
+            if sorted_models:
+                fastest_model, fastest_time = sorted_models[0]
+                slowest_model, slowest_time = sorted_models[-1]
+                
+                st.markdown(f"**Fastest Model:** {fastest_model} - {format_time(fastest_time)}")
+                st.markdown(f"**Slowest Model:** {slowest_model} - {format_time(slowest_time)}")
 
-def memo_editor_tab():
+def memo_editor_tab(api_key):
+    state = st.session_state
     st.header("Investment Memo Editor")
     st.markdown("""
     Edit sections of investment memos to make them more succinct and readable, similar to what you would read at top VC firms like Sequoia or A16Z.
@@ -58,49 +190,26 @@ def memo_editor_tab():
     This tool processes your markdown text through multiple LLMs and creates an optimized final version.
     """)
     
-    # Sidebar for settings and saved results
+    # Sidebar for saved results
     with st.sidebar:
-        st.header("Memo Editor Settings")
-        
-        # API Key input (use env var by default, allow override)
-        api_key_input = st.text_input("OpenRouter API Key (optional if set in .env)", value="", type="password", key="memo_api_key", help="Leave empty to use API key from .env file")
-        api_key = api_key_input if api_key_input else OPENROUTER_API_KEY
-        
-        # Memo section selection
-        st.subheader("Memo Section")
-        section_type = st.selectbox(
-            "Select memo section to edit", 
-            options=MEMO_SECTIONS,
-            help="Select which section of the investment memo this text belongs to",
-            key="memo_section_type"
-        )
-        
-        # Model selection
-        st.subheader("Models")
-        selected_models = []
-        for model in REASONING_MODELS:
-            if st.checkbox(model, value=True, key=f"memo_model_{model.replace('/', '_')}"):
-                selected_models.append(model)
-        
-        if not selected_models:
-            st.error("Please select at least one model")
-        
         # View saved results
         st.header("Saved Results")
+        # LocalStorage caches the listing until the database changes, whichever session saved
         saved_results = storage.list_results()
         if saved_results:
             selected_result = st.selectbox("Select a saved result", saved_results, key="memo_saved_results")
             if st.button("Load Selected Result", key="memo_load_result"):
                 result = storage.load_result(selected_result)
                 if result:
-                    st.session_state.memo_original_text = result["original_text"]
-                    st.session_state.memo_model_outputs = result["model_outputs"]
-                    st.session_state.memo_final_output = result["final_output"]
+                    state.memo_original_text = result["original_text"]
+                    state.memo_model_outputs = result["model_outputs"]
+                    state.memo_final_output = result["final_output"]
+                    state.memo_consensus_model = None
                     if "processing_times" in result:
-                        st.session_state.memo_processing_times = result["processing_times"]
+                        state.memo_processing_times = result["processing_times"]
                     else:
                         # Handle legacy results that don't have timing info
-                        st.session_state.memo_processing_times = {}
+                        state.memo_processing_times = {}
                     # Note: section_type will need to be manually selected after loading
         else:
             st.info("No saved results found")
@@ -111,53 +220,88 @@ def memo_editor_tab():
     with col1:
         st.header("Input")
         
-        # Input options
+        # Input options (outside the form so switching method swaps the input widget immediately)
         input_option = st.radio("Input method", ["Text Input", "File Upload"], key="memo_input_method")
         
-        markdown_text = ""
-        if input_option == "Text Input":
-            markdown_text = st.text_area("Enter your markdown text", height=400, value=st.session_state.get("memo_original_text", ""), key="memo_text_input")
-        else:
-            uploaded_file = st.file_uploader("Upload a markdown file", type=["md", "txt"], key="memo_file_upload")
-            if uploaded_file is not None:
-                markdown_text = uploaded_file.read().decode("utf-8")
-                st.session_state.memo_original_text = markdown_text
+        # Widgets inside the form only trigger a rerun when the form is submitted
+        with st.form("memo_form"):
+            markdown_text = ""
+            if input_option == "Text Input":
+                markdown_text = st.text_area("Enter your markdown text", height=400, value=state.memo_original_text, key="memo_text_input")
+            else:
+                uploaded_file = st.file_uploader("Upload a markdown file", type=["md", "txt"], key="memo_file_upload")
+                if uploaded_file is not None:
+                    markdown_text = decode_upload(uploaded_file.getvalue())
+                    state.memo_original_text = markdown_text
+            
+            # Memo section selection
+            st.subheader("Memo Section")
+            section_type = st.selectbox(
+                "Select memo section to edit", 
+                options=MEMO_SECTIONS,
+                help="Select which section of the investment memo this text belongs to",
+                key="memo_section_type"
+            )
+            
+            # Model selection
+            selected_models = st.multiselect("Models", options=REASONING_MODELS, default=REASONING_MODELS, key="memo_models")
+            
+            # Bypass cached responses for identical requests
+            force_rerun = st.checkbox("Force re-run", value=False, key="memo_force_rerun", help="Call every model again even if this exact text was processed before")
+            
+            # Process button
+            process_button = st.form_submit_button("Process Text")
+        
+        if not selected_models:
+            st.error("Please select at least one model")
         
-        # Process button
-        process_button = st.button("Process Text", key="memo_process_button")
         if process_button and markdown_text and api_key and selected_models:
             with st.spinner(f"Processing {section_type} section with all models in parallel..."):
                 try:
-                    # Initialize client and processor
-                    client = OpenRouterClient(api_key)
-                    processor = MarkdownProcessor(client)
+                    # Reuse the cached processor for this API key
+                    processor = get_processor(api_key)
+                    
+                    # Live view of every output while it streams in; cleared once the run completes
+                    live_view = st.empty()
+                    with live_view.container():
+                        final_placeholder = st.expander("Final Output", expanded=True).empty()
+                        model_placeholders = {model: st.expander(get_model_display_name(model)).empty() for model in selected_models}
+                    
+                    last_refresh = {}
+                    def show_partial(placeholder, name, text):
+                        # Re-render at most ten times a second per output to bound websocket traffic
+                        now = time.time()
+                        if now - last_refresh.get(name, 0.0) >= 0.1:
+                            last_refresh[name] = now
+                            placeholder.markdown(text)
                     
-                    # Process with all selected models in parallel, passing the section type
-                    model_outputs = processor.process_with_reasoning_models(
+                    # Run the selected models and the final consolidation as one pipeline;
+                    # the final call is sent as soon as the last model output arrives
+                    model_outputs, final_output, final_time = asyncio.run(processor.run_pipeline(
                         markdown_text, 
                         section_type,
-                        selected_models
-                    )
+                        selected_models,
+                        use_cache=not force_rerun,
+                        on_update=lambda model, text: show_partial(model_placeholders[model], model, text),
+                        on_final_update=lambda text: show_partial(final_placeholder, "final", text)
+                    ))
+                    live_view.empty()
                     
-                    # Only create final version after all model outputs are ready
                     if model_outputs and len(model_outputs) > 0:
-                        # Create the final consolidated version using all model outputs
-                        final_output, final_time = processor.create_final_version(
-                            markdown_text, 
-                            model_outputs,
-                            section_type
-                        )
-                        
                         # Extract outputs and times for easier handling
                         outputs = {model: data["output"] for model, data in model_outputs.items()}
                         times = {model: data["time"] for model, data in model_outputs.items()}
-                        times[f"Final ({FINAL_MODEL})"] = final_time
+                        # With a consensus the final model was never called, so it has no time to chart
+                        consensus_model = next((model for model, data in model_outputs.items() if data.get("consensus")), None)
+                        if final_time is not None:
+                            times[FINAL_TIMING_KEY] = final_time
                         
                         # Save to session state
-                        st.session_state.memo_original_text = markdown_text
-                        st.session_state.memo_model_outputs = outputs
-                        st.session_state.memo_processing_times = times
-                        st.session_state.memo_final_output = final_output
+                        state.memo_consensus_model = consensus_model
+                        state.memo_original_text = markdown_text
+                        state.memo_model_outputs = outputs
+                        state.memo_processing_times = times
+                        state.memo_final_output = final_output
                         
                         # Save results with timing information and section type
                         storage.save_result(
@@ -177,53 +321,71 @@ def memo_editor_tab():
     with col2:
         st.header("Output")
         
-        if "memo_model_outputs" in st.session_state and "memo_final_output" in st.session_state:
-            # Display section type if available
-            st.info(f"Section type: {section_type}")
-                
-            # Create tabs for outputs
-            tab_names = ["Final Output"] + [get_model_display_name(model) for model in st.session_state.memo_model_outputs.keys()]
-            tabs = st.tabs(tab_names)
-            
-            # Display final output
-            with tabs[0]:
-                final_time = st.session_state.memo_processing_times.get(f"Final ({FINAL_MODEL})", 0)
-                st.info(f"Processing time: {format_time(final_time)}")
-                st.markdown(st.session_state.memo_final_output)
-                if st.button("Save to File", key="memo_save_final"):
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"edited_memo_{timestamp}.md"
-                    with open(filename, "w", encoding="utf-8") as f:
-                        f.write(st.session_state.memo_final_output)
-                    st.success(f"Saved to {filename}")
+        render_memo_outputs(section_type)
+
+@st.fragment
+def render_prompt_outputs(prompt_section_type):
+    """Render the generated prompts panel; widget clicks inside it rerun only this fragment"""
+    state = st.session_state
+    if state.prompt_model_outputs:
+        # Display section type if available
+        st.info(f"Chapter type: {prompt_section_type}")
+        
+        # Display both prompts side by side
+        st.subheader("📋 Excel-Ready Output")
+        st.markdown("*Copy and paste the content below into your Excel spreadsheet:*")
+        
+        # Chapter General Prompt
+        st.markdown("**Chapter General Prompt:**")
+        st.text_area("", value=state.prompt_general_prompt, height=200, key="general_prompt_display")
+        
+        # Section Instructions
+        st.markdown("**Section Instructions:**")
+        st.text_area("", value=state.prompt_section_instructions, height=200, key="section_instructions_display")
+        
+        # Save to file option
+        if st.button("Save Prompts to File", key="prompt_save_final"):
+            content = "".join([
+                f"CHAPTER TYPE: {prompt_section_type}\n\n",
+                "CHAPTER GENERAL PROMPT:\n",
+                state.prompt_general_prompt,
+                "\n\n" + "="*50 + "\n\n",
+                "SECTION INSTRUCTIONS:\n",
+                state.prompt_section_instructions
+            ])
+            # Name the file after its content so saving the same prompts twice reuses one file
+            data = content.encode("utf-8")
+            filename = f"generated_prompts_{hashlib.blake2b(data, digest_size=8).hexdigest()}.txt"
+            Path(filename).write_bytes(data)
+            st.success(f"Saved to {filename}")
+        
+        # Show model outputs in expandable sections
+        st.subheader("🔍 Individual Model Outputs")
+        for model in state.prompt_model_outputs.keys():
+            display_name = get_model_display_name(model)
+            with st.expander(f"{display_name} - {format_time(state.prompt_processing_times.get(model, 0))}"):
+                st.markdown(state.prompt_model_outputs[model])
+        
+        # Show timing comparison
+        st.subheader("⚡ Performance Comparison")
+        times = state.prompt_processing_times
+        if times:
+            # Sort models by processing time
+            sorted_models = sorted(times.items(), key=lambda x: x[1])
             
-            # Display model outputs with timing
-            for i, model in enumerate(st.session_state.memo_model_outputs.keys(), 1):
-                with tabs[i]:
-                    # Show processing time for this model
-                    model_time = st.session_state.memo_processing_times.get(model, 0)
-                    st.info(f"Processing time: {format_time(model_time)}")
-                    st.markdown(st.session_state.memo_model_outputs[model])
+            # Create a bar chart for timing comparison, fastest first
+            st.altair_chart(timing_chart(sorted_models), use_container_width=True)
             
-            # Show timing comparison for all models
-            st.header("Performance Comparison")
-            times = st.session_state.memo_processing_times
-            if times:
-                # Sort models by processing time
-                sorted_models = sorted(times.items(), key=lambda x: x[1])
-                
-                # Create a bar chart for timing comparison
-                st.bar_chart({model: time for model, time in sorted_models})
+            # Display fastest and slowest model
+            if sorted_models:
+                fastest_model, fastest_time = sorted_models[0]
+                slowest_model, slowest_time = sorted_models[-1]
                 
-                # Display fastest and slowest model
-                if sorted_models:
-                    fastest_model, fastest_time = sorted_models[0]
-                    slowest_model, slowest_time = sorted_models[-1]
-                    
-                    st.markdown(f"**Fastest Model:** {fastest_model} - {format_time(fastest_time)}")
-                    st.markdown(f"**Slowest Model:** {slowest_model} - {format_time(slowest_time)}")
+                st.markdown(f"**Fastest Model:** {fastest_model} - {format_time(fastest_time)}")
+                st.markdown(f"**Slowest Model:** {slowest_model} - {format_time(slowest_time)}")
 
-def prompt_generator_tab():
+def prompt_generator_tab(api_key):
+    state = st.session_state
     st.header("AI Prompt Generator")
     st.markdown("""
     Generate AI prompts for investment memo analysis. Input a section of an investment memo, and this tool will create:
@@ -234,42 +396,17 @@ def prompt_generator_tab():
     The generated prompts can be copied and pasted into Excel for further use.
     """)
     
-    # Sidebar for prompt generator settings
+    # Sidebar for the connection test
     with st.sidebar:
-        st.header("Prompt Generator Settings")
-        
-        # API Key input (use env var by default, allow override)
-        prompt_api_key_input = st.text_input("OpenRouter API Key (optional if set in .env)", value="", type="password", key="prompt_api_key", help="Leave empty to use API key from .env file")
-        prompt_api_key = prompt_api_key_input if prompt_api_key_input else OPENROUTER_API_KEY
-        
-        # Chapter type selection
-        st.subheader("Chapter Type")
-        prompt_section_type = st.selectbox(
-            "Select chapter type", 
-            options=MEMO_SECTIONS,
-            help="Select which type of investment memo chapter this content represents",
-            key="prompt_section_type"
-        )
-        
-        # Model selection for prompt generation
-        st.subheader("Models")
-        prompt_selected_models = []
-        for model in REASONING_MODELS:
-            if st.checkbox(model, value=True, key=f"prompt_model_{model.replace('/', '_')}"):
-                prompt_selected_models.append(model)
-        
-        if not prompt_selected_models:
-            st.error("Please select at least one model")
-        
         # Connection test
         st.subheader("🔗 Connection Test")
         if st.button("Test API Connection", key="test_connection"):
             try:
-                response = requests.get("https://openrouter.ai", timeout=5)
-                if response.status_code == 200:
+                status_code = probe_openrouter()
+                if status_code == 200:
                     st.success("✅ Connection to OpenRouter successful!")
                 else:
-                    st.warning(f"⚠️ OpenRouter responded with status: {response.status_code}")
+                    st.warning(f"⚠️ OpenRouter responded with status: {status_code}")
             except Exception as e:
                 st.error(f"❌ Connection failed: {str(e)}")
                 st.info("💡 Try: Check internet connection, VPN, or firewall settings")
@@ -280,32 +417,53 @@ def prompt_generator_tab():
     with col1:
         st.header("Input")
         
-        # Input options
+        # Input options (outside the form so switching method swaps the input widget immediately)
         prompt_input_option = st.radio("Input method", ["Text Input", "File Upload"], key="prompt_input_method")
         
-        memo_text = ""
-        if prompt_input_option == "Text Input":
-            memo_text = st.text_area("Enter investment memo section", height=400, value=st.session_state.get("prompt_original_text", ""), key="prompt_text_input")
-        else:
-            prompt_uploaded_file = st.file_uploader("Upload a memo section file", type=["md", "txt"], key="prompt_file_upload")
-            if prompt_uploaded_file is not None:
-                memo_text = prompt_uploaded_file.read().decode("utf-8")
-                st.session_state.prompt_original_text = memo_text
+        # Widgets inside the form only trigger a rerun when the form is submitted
+        with st.form("prompt_form"):
+            memo_text = ""
+            if prompt_input_option == "Text Input":
+                memo_text = st.text_area("Enter investment memo section", height=400, value=state.prompt_original_text, key="prompt_text_input")
+            else:
+                prompt_uploaded_file = st.file_uploader("Upload a memo section file", type=["md", "txt"], key="prompt_file_upload")
+                if prompt_uploaded_file is not None:
+                    memo_text = decode_upload(prompt_uploaded_file.getvalue())
+                    state.prompt_original_text = memo_text
+            
+            # Chapter type selection
+            st.subheader("Chapter Type")
+            prompt_section_type = st.selectbox(
+                "Select chapter type", 
+                options=MEMO_SECTIONS,
+                help="Select which type of investment memo chapter this content represents",
+                key="prompt_section_type"
+            )
+            
+            # Model selection for prompt generation
+            prompt_selected_models = st.multiselect("Models", options=REASONING_MODELS, default=REASONING_MODELS, key="prompt_models")
+            
+            # Bypass cached responses for identical requests
+            prompt_force_rerun = st.checkbox("Force re-run", value=False, key="prompt_force_rerun", help="Call every model again even if this exact text was processed before")
+            
+            # Generate prompts button
+            generate_button = st.form_submit_button("Generate Prompts")
+        
+        if not prompt_selected_models:
+            st.error("Please select at least one model")
         
-        # Generate prompts button
-        generate_button = st.button("Generate Prompts", key="prompt_generate_button")
-        if generate_button and memo_text and prompt_api_key and prompt_selected_models:
+        if generate_button and memo_text and api_key and prompt_selected_models:
             with st.spinner(f"Generating prompts for {prompt_section_type} with all models in parallel..."):
                 try:
-                    # Initialize client and prompt generator
-                    client = OpenRouterClient(prompt_api_key)
-                    generator = PromptGenerator(client)
+                    # Reuse the cached prompt generator for this API key
+                    generator = get_prompt_generator(api_key)
                     
                     # Generate prompts with all selected models in parallel
                     model_outputs = generator.generate_prompts_with_models(
                         memo_text, 
                         prompt_section_type,
-                        prompt_selected_models
+                        prompt_selected_models,
+                        use_cache=not prompt_force_rerun
                     )
                     
                     # Only create final version after all model outputs are ready
@@ -314,7 +472,8 @@ def prompt_generator_tab():
                         final_output, final_time = generator.create_final_prompts(
                             memo_text, 
                             model_outputs,
-                            prompt_section_type
+                            prompt_section_type,
+                            use_cache=not prompt_force_rerun
                         )
                         
                         # Parse the final output into separate prompts
@@ -323,15 +482,15 @@ def prompt_generator_tab():
                         # Extract outputs and times for easier handling
                         outputs = {model: data["output"] for model, data in model_outputs.items()}
                         times = {model: data["time"] for model, data in model_outputs.items()}
-                        times[f"Final ({FINAL_MODEL})"] = final_time
+                        times[FINAL_TIMING_KEY] = final_time
                         
                         # Save to session state
-                        st.session_state.prompt_original_text = memo_text
-                        st.session_state.prompt_model_outputs = outputs
-                        st.session_state.prompt_processing_times = times
-                        st.session_state.prompt_final_output = final_output
-                        st.session_state.prompt_general_prompt = general_prompt
-                        st.session_state.prompt_section_instructions = section_instructions
+                        state.prompt_original_text = memo_text
+                        state.prompt_model_outputs = outputs
+                        state.prompt_processing_times = times
+                        state.prompt_final_output = final_output
+                        state.prompt_general_prompt = general_prompt
+                        state.prompt_section_instructions = section_instructions
                         
                         st.success(f"Prompt generation complete! Processed with {len(model_outputs)} models.")
                     else:
@@ -342,59 +501,7 @@ def prompt_generator_tab():
     with col2:
         st.header("Generated Prompts")
         
-        if "prompt_general_prompt" in st.session_state and "prompt_section_instructions" in st.session_state:
-            # Display section type if available
-            st.info(f"Chapter type: {prompt_section_type}")
-            
-            # Display both prompts side by side
-            st.subheader("📋 Excel-Ready Output")
-            st.markdown("*Copy and paste the content below into your Excel spreadsheet:*")
-            
-            # Chapter General Prompt
-            st.markdown("**Chapter General Prompt:**")
-            st.text_area("", value=st.session_state.prompt_general_prompt, height=200, key="general_prompt_display")
-            
-            # Section Instructions
-            st.markdown("**Section Instructions:**")
-            st.text_area("", value=st.session_state.prompt_section_instructions, height=200, key="section_instructions_display")
-            
-            # Save to file option
-            if st.button("Save Prompts to File", key="prompt_save_final"):
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"generated_prompts_{timestamp}.txt"
-                with open(filename, "w", encoding="utf-8") as f:
-                    f.write(f"CHAPTER TYPE: {prompt_section_type}\n\n")
-                    f.write("CHAPTER GENERAL PROMPT:\n")
-                    f.write(st.session_state.prompt_general_prompt)
-                    f.write("\n\n" + "="*50 + "\n\n")
-                    f.write("SECTION INSTRUCTIONS:\n")
-                    f.write(st.session_state.prompt_section_instructions)
-                st.success(f"Saved to {filename}")
-            
-            # Show model outputs in expandable sections
-            st.subheader("🔍 Individual Model Outputs")
-            for model in st.session_state.prompt_model_outputs.keys():
-                display_name = get_model_display_name(model)
-                with st.expander(f"{display_name} - {format_time(st.session_state.prompt_processing_times.get(model, 0))}"):
-                    st.markdown(st.session_state.prompt_model_outputs[model])
-            
-            # Show timing comparison
-            st.subheader("⚡ Performance Comparison")
-            times = st.session_state.prompt_processing_times
-            if times:
-                # Sort models by processing time
-                sorted_models = sorted(times.items(), key=lambda x: x[1])
-                
-                # Create a bar chart for timing comparison
-                st.bar_chart({model: time for model, time in sorted_models})
-                
-                # Display fastest and slowest model
-                if sorted_models:
-                    fastest_model, fastest_time = sorted_models[0]
-                    slowest_model, slowest_time = sorted_models[-1]
-                    
-                    st.markdown(f"**Fastest Model:** {fastest_model} - {format_time(fastest_time)}")
-                    st.markdown(f"**Slowest Model:** {slowest_model} - {format_time(slowest_time)}")
+        render_prompt_outputs(prompt_section_type)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
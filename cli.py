@@ -1,36 +1,52 @@
 import typer
 import os
+import sys
 import time
+from functools import lru_cache
 from typing import Optional
 from pathlib import Path
 from rich.console import Console
-from rich.markdown import Markdown
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
 
-from openrouter_client import OpenRouterClient
-from processors import MarkdownProcessor, REASONING_MODELS, FINAL_MODEL, REASONING_SYSTEM_PROMPT
+# Only lightweight modules are imported here so `list` and `view` start quickly;
+# the HTTP client stack and asyncio are imported inside `process`
+from processors import FINAL_TIMING_KEY, MEMO_SECTIONS, STRAGGLER_POLICIES
 from storage import LocalStorage
 
 app = typer.Typer()
-console = Console()
+# Skip Rich's per-line highlighter; output is mostly large Markdown panels
+console = Console(highlight=False)
+
+@lru_cache(maxsize=64)
+def render_markdown(text: str):
+    """Parse a Markdown text once, however many panels show it"""
+    from rich.markdown import Markdown
+    return Markdown(text)
 
 def format_time(seconds):
     """Format time in seconds to a readable format"""
     if seconds < 60:
         return f"{seconds:.2f} seconds"
     else:
-        minutes = int(seconds // 60)
-        seconds = seconds % 60
-        return f"{minutes} min {seconds:.2f} sec"
+        minutes, seconds = divmod(seconds, 60)
+        return f"{int(minutes)} min {seconds:.2f} sec"
 
 @app.command()
 def process(
     input_file: Optional[Path] = typer.Option(None, "--file", "-f", help="Path to markdown file"),
-    save: bool = typer.Option(True, help="Save results to local storage")
+    section: str = typer.Option("Market Research", "--section", "-s", help=f"Memo section the text belongs to ({', '.join(MEMO_SECTIONS)})"),
+    save: bool = typer.Option(True, help="Save results to local storage"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Call every model again instead of reusing cached responses"),
+    min_outputs: Optional[int] = typer.Option(None, "--min-outputs", help="Start the final version once this many models have returned instead of waiting for all of them"),
+    straggler_policy: str = typer.Option("keep", "--straggler-policy", help="With --min-outputs, what to do with models still running when the final version starts: keep (finish for display only), cancel, or restart (redo the final version if they all finish first)")
 ):
     """Process a markdown document through multiple LLMs for editing"""
+    import asyncio
+    from rich.live import Live
+    from openrouter_client import OpenRouterClient
+    from response_cache import ResponseCache, DEFAULT_CACHE_DIR
+    from processors import MarkdownProcessor, REASONING_MODELS
     
     # Get API key
     api_key = os.getenv("OPENROUTER_API_KEY")
@@ -38,8 +54,17 @@ def process(
         console.print("[bold red]Error:[/bold red] OpenRouter API key not found. Set the OPENROUTER_API_KEY environment variable.")
         raise typer.Exit(1)
     
+    if straggler_policy not in STRAGGLER_POLICIES:
+        console.print(f"[bold red]Error:[/bold red] Unknown straggler policy '{straggler_policy}'. Choose one of: {', '.join(STRAGGLER_POLICIES)}")
+        raise typer.Exit(1)
+    
+    if section not in MEMO_SECTIONS:
+        console.print(f"[bold red]Error:[/bold red] Unknown section '{section}'. Choose one of: {', '.join(MEMO_SECTIONS)}")
+        raise typer.Exit(1)
+    
     # Initialize components
-    client = OpenRouterClient(api_key)
+    # Responses are kept on disk so re-running the same text skips the network
+    client = OpenRouterClient(api_key, cache=ResponseCache(cache_dir=DEFAULT_CACHE_DIR))
     processor = MarkdownProcessor(client)
     storage = LocalStorage()
     
@@ -54,13 +79,7 @@ def process(
             raise typer.Exit(1)
     else:
         console.print("[bold]Enter your markdown text (press Ctrl+D when finished):[/bold]")
-        lines = []
-        try:
-            while True:
-                line = input()
-                lines.append(line)
-        except EOFError:
-            markdown_text = "\n".join(lines)
+        markdown_text = sys.stdin.read()
     
     # Early return if no text
     if not markdown_text.strip():
@@ -69,53 +88,72 @@ def process(
     
     # Display original text
     console.print("\n[bold]Original Text:[/bold]")
-    console.print(Panel(Markdown(markdown_text), title="Original", width=100))
+    console.print(Panel(render_markdown(markdown_text), title="Original", width=100))
     
-    # Process through reasoning models
-    console.print(f"\n[bold]Processing through reasoning models...[/bold]")
+    # Live status of every model while the pipeline runs; the full outputs are printed afterwards
+    status = {model: "[dim]waiting[/dim]" for model in REASONING_MODELS}
+    status[FINAL_TIMING_KEY] = "[dim]waiting for all models[/dim]"
+    received = {}
     
-    # Use the full parallel processing for all models
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console
-    ) as progress:
-        task = progress.add_task("[cyan]Processing...", total=1)
-        
-        # Process with all models in parallel
-        model_results = processor.process_with_reasoning_models(markdown_text, REASONING_MODELS)
-        
-        progress.update(task, completed=1)
+    def on_update(model, text):
+        received[model] = len(text)
+        status[model] = f"[yellow]streaming[/yellow] ({received[model]:,} chars)"
+    
+    def on_result(model, data):
+        status[model] = f"[green]done[/green] in {format_time(data['time'])}"
+    
+    def on_final_update(text):
+        status[FINAL_TIMING_KEY] = f"[yellow]streaming[/yellow] ({len(text):,} chars)"
     
-    # Extract outputs and times for easier handling
+    def status_table():
+        table = Table(title=f"Processing {section} section")
+        table.add_column("Model", style="cyan")
+        table.add_column("Status")
+        for model, state in status.items():
+            table.add_row(model, state)
+        return table
+    
+    async def run_models():
+        # One async HTTP client spans every model call and the final call, so connections are reused;
+        # the final call starts as soon as the slowest reasoning model (or the min_outputs-th) returns
+        async with client:
+            return await processor.run_pipeline(
+                markdown_text,
+                section,
+                use_cache=not no_cache,
+                on_update=on_update,
+                on_final_update=on_final_update,
+                on_result=on_result,
+                min_outputs=min_outputs,
+                straggler_policy=straggler_policy
+            )
+    
+    console.print(f"\n[bold]Processing through reasoning models...[/bold]")
+    with Live(get_renderable=status_table, console=console, refresh_per_second=8, transient=True):
+        model_results, final_output, final_time = asyncio.run(run_models())
+    
+    # Extract outputs and times for easier handling; models are in the order they finished
     model_outputs = {model: data["output"] for model, data in model_results.items()}
     processing_times = {model: data["time"] for model, data in model_results.items()}
+    # With a consensus the final model was never called, so it has no time to report
+    consensus_model = next((model for model, data in model_results.items() if data.get("consensus")), None)
+    if final_time is not None:
+        processing_times[FINAL_TIMING_KEY] = final_time
+    
+    # Format every time once; the panels, the table and the summary all reuse these
+    formatted_times = {model: format_time(time_taken) for model, time_taken in processing_times.items()}
     
     # Display model outputs with timing
     for model, output in model_outputs.items():
-        time_taken = processing_times[model]
-        console.print(f"\n[bold]Output from {model} (took {format_time(time_taken)}):[/bold]")
-        console.print(Panel(Markdown(output), title=model, width=100))
-    
-    # Create the final consolidated version
-    console.print("\n[bold]Creating final version...[/bold]")
-    
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console
-    ) as progress:
-        task = progress.add_task(f"[cyan]Processing with {FINAL_MODEL}...", total=1)
-        
-        # Process final version
-        final_output, final_time = processor.create_final_version(markdown_text, model_results)
-        processing_times[f"Final ({FINAL_MODEL})"] = final_time
-        
-        progress.update(task, completed=1)
+        console.print(f"\n[bold]Output from {model} (took {formatted_times[model]}):[/bold]")
+        console.print(Panel(render_markdown(output), title=model, width=100))
     
     # Display final output
-    console.print(f"\n[bold]Final Output (took {format_time(final_time)}):[/bold]")
-    console.print(Panel(Markdown(final_output), title="Final Version", width=100))
+    if consensus_model is not None:
+        console.print(f"\n[bold]Final Output (consensus of the models, taken from {consensus_model}):[/bold]")
+    else:
+        console.print(f"\n[bold]Final Output (took {formatted_times[FINAL_TIMING_KEY]}):[/bold]")
+    console.print(Panel(render_markdown(final_output), title="Final Version", width=100))
     
     # Display timing comparison
     console.print("\n[bold]Performance Comparison:[/bold]")
@@ -126,30 +164,31 @@ def process(
     # Sort models by processing time
     sorted_models = sorted(processing_times.items(), key=lambda x: x[1])
     
-    for model, time_taken in sorted_models:
-        table.add_row(model, format_time(time_taken))
+    for model, _ in sorted_models:
+        table.add_row(model, formatted_times[model])
     
     console.print(table)
     
     # Report fastest and slowest
     if sorted_models:
-        fastest_model, fastest_time = sorted_models[0]
-        slowest_model, slowest_time = sorted_models[-1]
-        console.print(f"\n[bold green]Fastest model:[/bold green] {fastest_model} ({format_time(fastest_time)})")
-        console.print(f"[bold red]Slowest model:[/bold red] {slowest_model} ({format_time(slowest_time)})")
+        fastest_model = sorted_models[0][0]
+        slowest_model = sorted_models[-1][0]
+        console.print(f"\n[bold green]Fastest model:[/bold green] {fastest_model} ({formatted_times[fastest_model]})")
+        console.print(f"[bold red]Slowest model:[/bold red] {slowest_model} ({formatted_times[slowest_model]})")
     
     # Save results
     if save:
-        filepath = storage.save_result(
+        result_id = storage.save_result(
             markdown_text, 
             model_outputs, 
             final_output,
-            processing_times
+            processing_times,
+            section
         )
-        console.print(f"\n[bold green]Results saved to:[/bold green] {filepath}")
+        console.print(f"\n[bold green]Results saved as:[/bold green] {result_id}")
 
-@app.command()
-def list():
+@app.command("list")
+def list_results():
     """List previously saved results"""
     storage = LocalStorage()
     results = storage.list_results()
@@ -166,7 +205,7 @@ def list():
 
 @app.command()
 def view(filename: str):
-    """View a specific saved result"""
+    """View a specific saved result by its ID (as shown by the list command)"""
     storage = LocalStorage()
     result = storage.load_result(filename)
     
@@ -175,18 +214,20 @@ def view(filename: str):
         return
     
     console.print("\n[bold]Original Text:[/bold]")
-    console.print(Panel(Markdown(result["original_text"]), title="Original", width=100))
+    console.print(Panel(render_markdown(result["original_text"]), title="Original", width=100))
+    
+    # Format every stored time once; older results may not have any
+    formatted_times = {model: format_time(time_taken) for model, time_taken in result.get("processing_times", {}).items()}
     
     console.print("\n[bold]Model Outputs:[/bold]")
     for model, output in result["model_outputs"].items():
         # Display processing time if available
         time_info = ""
-        if "processing_times" in result and model in result["processing_times"]:
-            time_taken = result["processing_times"][model]
-            time_info = f" (took {format_time(time_taken)})"
+        if model in formatted_times:
+            time_info = f" (took {formatted_times[model]})"
         
         console.print(f"\n[bold]Output from {model}{time_info}:[/bold]")
-        console.print(Panel(Markdown(output), title=model, width=100))
+        console.print(Panel(render_markdown(output), title=model, width=100))
     
     # Display timing comparison if available
     if "processing_times" in result:
@@ -198,19 +239,18 @@ def view(filename: str):
         # Sort models by processing time
         sorted_models = sorted(result["processing_times"].items(), key=lambda x: x[1])
         
-        for model, time_taken in sorted_models:
-            table.add_row(model, format_time(time_taken))
+        for model, _ in sorted_models:
+            table.add_row(model, formatted_times[model])
         
         console.print(table)
     
     # Display final output
     final_time_info = ""
-    if "processing_times" in result and f"Final ({FINAL_MODEL})" in result["processing_times"]:
-        final_time = result["processing_times"][f"Final ({FINAL_MODEL})"]
-        final_time_info = f" (took {format_time(final_time)})"
+    if FINAL_TIMING_KEY in formatted_times:
+        final_time_info = f" (took {formatted_times[FINAL_TIMING_KEY]})"
     
     console.print(f"\n[bold]Final Output{final_time_info}:[/bold]")
-    console.print(Panel(Markdown(result["final_output"]), title="Final Version", width=100))
+    console.print(Panel(render_markdown(result["final_output"]), title="Final Version", width=100))
 
 if __name__ == "__main__":
     app() 
\ No newline at end of file
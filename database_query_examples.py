@@ -4,14 +4,18 @@ Database Query Examples
 Demonstrates how to query the SQLite database created from the Excel template
 """
 
+import os
+import hashlib
 import sqlite3
-import pandas as pd
-import json
+import orjson
 
 def query_database_examples():
     """
     Examples of how to query the converted database
     """
+    # pandas is slow to import and only needed for the query examples
+    import pandas as pd
+    
     db_file = "converted_data/base_template.db"
     
     try:
@@ -47,12 +51,12 @@ def query_database_examples():
         """, conn)
         print(df_filtered)
         
-        # Example 4: Search in text content
+        # Example 4: Search in text content through the FTS5 full-text index
         print("\n4. SEARCH FOR SPECIFIC KEYWORDS:")
         df_search = pd.read_sql_query("""
             SELECT [Chapter Name], [Product and Technology]
-            FROM sheet1 
-            WHERE [Product and Technology] LIKE '%technology%'
+            FROM sheet1_fts 
+            WHERE [Product and Technology] MATCH 'technology'
         """, conn)
         print(df_search)
         
@@ -83,8 +87,8 @@ def programmatic_access_example():
     json_file = "converted_data/base_template_Sheet1.json"
     
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(json_file, 'rb') as f:
+            data = orjson.loads(f.read())
         
         print("\n1. ACCESS SPECIFIC CHAPTER INSTRUCTIONS:")
         for item in data:
@@ -113,10 +117,36 @@ def create_api_ready_structure():
     print("API-READY DATA STRUCTURE")
     print("=" * 60)
     
+    json_file = "converted_data/base_template_Sheet1.json"
+    api_file = "converted_data/api_ready_template.json"
+    sig_file = api_file + ".sig"
+    
     try:
+        # Skip regeneration when the source JSON is unchanged since the last run,
+        # checking mtime and size first and the content hash only if those differ
+        stat = os.stat(json_file)
+        previous = {}
+        if os.path.exists(api_file) and os.path.exists(sig_file):
+            with open(sig_file, 'rb') as f:
+                previous = orjson.loads(f.read())
+        
+        if previous.get("mtime") == stat.st_mtime and previous.get("size") == stat.st_size:
+            print(f"API-ready structure is up to date: {api_file}")
+            return
+        
         # Load the JSON data
-        with open("converted_data/base_template_Sheet1.json", 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(json_file, 'rb') as f:
+            raw = f.read()
+        signature = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": hashlib.sha256(raw).hexdigest()}
+        
+        if previous.get("sha256") == signature["sha256"]:
+            # Touched but not changed; remember the new mtime so the next check is cheap
+            with open(sig_file, 'wb') as f:
+                f.write(orjson.dumps(signature))
+            print(f"API-ready structure is up to date: {api_file}")
+            return
+        
+        data = orjson.loads(raw)
         
         # Create a more structured format
         api_structure = {
@@ -150,10 +180,13 @@ def create_api_ready_structure():
                             sections = [s.strip() for s in sections_text.split("\n") if s.strip()]
                             api_structure["investment_memo_template"]["chapters"][chapter_key]["sections"] = sections
         
-        # Save the API-ready structure
-        api_file = "converted_data/api_ready_template.json"
-        with open(api_file, 'w', encoding='utf-8') as f:
-            json.dump(api_structure, f, indent=2, ensure_ascii=False)
+        # Save the API-ready structure atomically, then record the source it was built from
+        tmp_file = api_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(api_structure, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, api_file)
+        with open(sig_file, 'wb') as f:
+            f.write(orjson.dumps(signature))
         
         print(f"Created API-ready structure: {api_file}")
         
@@ -162,7 +195,7 @@ def create_api_ready_structure():
         sample = {
             k: v for k, v in list(api_structure["investment_memo_template"]["chapters"].items())[:2]
         }
-        print(json.dumps(sample, indent=2)[:500] + "...")
+        print(orjson.dumps(sample, option=orjson.OPT_INDENT_2).decode('utf-8')[:500] + "...")
         
     except Exception as e:
         print(f"Error creating API structure: {e}")
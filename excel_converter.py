@@ -5,73 +5,197 @@ Converts Excel files to CSV, JSON, and SQLite database formats
 """
 
 import pandas as pd
-import json
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import orjson
 import sqlite3
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def convert_excel_to_formats(excel_file, output_dir="converted_data"):
+def _sqlite_column_type(dtype):
+    """Map a pandas dtype to the SQLite column type DataFrame.to_sql would use"""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+def write_sqlite_table(conn, table_name, df):
+    """
+    Replace a table with the contents of a DataFrame in a single transaction
+    
+    Args:
+        conn: SQLite connection opened with isolation_level=None
+        table_name (str): Name of the table to (re)create
+        df (DataFrame): Rows to insert; NaN values are stored as NULL
+    """
+    # Datetimes are stored as text in the same format to_sql uses
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col].dtype):
+            df = df.assign(**{col: df[col].dt.strftime('%Y-%m-%d %H:%M:%S')})
+    
+    quoted_columns = ['"' + str(col).replace('"', '""') + '"' for col in df.columns]
+    column_ddl = ", ".join(f"{name} {_sqlite_column_type(dtype)}" for name, dtype in zip(quoted_columns, df.dtypes))
+    placeholders = ", ".join("?" * len(quoted_columns))
+    
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(f'CREATE TABLE "{table_name}" ({column_ddl})')
+        conn.executemany(f'INSERT INTO "{table_name}" VALUES ({placeholders})', df.itertuples(index=False, name=None))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def create_fts_index(conn, table_name, df):
+    """
+    (Re)build an FTS5 full-text index over the text columns of a table
+    
+    The index is an external-content table named <table_name>_fts, so it stores
+    only the inverted index and reads the text itself from the source table.
+    
+    Args:
+        conn: SQLite connection opened with isolation_level=None
+        table_name (str): Name of the table to index
+        df (DataFrame): The rows written to the table, used to pick its text columns
+    """
+    text_columns = [col for col, dtype in df.dtypes.items() if _sqlite_column_type(dtype) == "TEXT"]
+    if not text_columns:
+        return
+    
+    fts_table = f"{table_name}_fts"
+    quoted_columns = ", ".join('"' + str(col).replace('"', '""') + '"' for col in text_columns)
+    
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS "{fts_table}"')
+        conn.execute(f'''CREATE VIRTUAL TABLE "{fts_table}" USING fts5({quoted_columns}, content='{table_name}', content_rowid='rowid')''')
+        conn.execute(f'''INSERT INTO "{fts_table}"("{fts_table}") VALUES('rebuild')''')
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _arrow_csv_compatible(series):
+    """Whether Arrow writes a column as the same CSV text as pandas: integers, or text and blanks"""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return True
+    # Arrow formats floats, booleans and datetimes differently (1 for 1.0, true, full timestamps)
+    return series.dtype == object and all(isinstance(value, str) for value in series.dropna())
+
+def write_csv(df, csv_file):
+    """
+    Write a DataFrame to CSV with Arrow's C++ writer instead of pandas' Python-level one,
+    falling back to pandas for columns Arrow would convert or format differently
+    """
+    if all(_arrow_csv_compatible(df[col]) for col in df.columns):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            table = None
+        if table is not None:
+            pacsv.write_csv(table, csv_file, write_options=pacsv.WriteOptions(include_header=True, quoting_style='needed'))
+            return
+    df.to_csv(csv_file, index=False)
+
+def write_json(df, json_file):
+    """Write a DataFrame as a JSON list of records, with NaN values as null"""
+    # Fill NaN values in a single pass over an object array
+    columns = df.columns.tolist()
+    json_data = [dict(zip(columns, row)) for row in df.to_numpy(dtype=object, na_value=None)]
+    with open(json_file, 'wb') as f:
+        f.write(orjson.dumps(json_data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+
+def convert_excel_to_formats(excel_file, excel_data=None, output_dir="converted_data"):
     """
     Convert Excel file to multiple machine-readable formats
     
     Args:
         excel_file (str): Path to the Excel file
+        excel_data (dict): Sheets already parsed by analyze_excel_structure; the file is
+            only read when this is None
         output_dir (str): Directory to save converted files
+    
+    Returns:
+        list: Names of the converted sheets, or None if conversion failed
     """
     
     # Create output directory if it doesn't exist
     Path(output_dir).mkdir(exist_ok=True)
     
-    # Read the Excel file
-    print(f"Reading Excel file: {excel_file}")
-    
+    workbook = None
     try:
-        # Read all sheets from the Excel file
-        excel_data = pd.read_excel(excel_file, sheet_name=None, engine='openpyxl')
+        if excel_data is None:
+            # Read the Excel file
+            print(f"Reading Excel file: {excel_file}")
+            
+            # Open the workbook once; sheets are parsed one at a time so only one is held in memory
+            workbook = pd.ExcelFile(excel_file, engine='openpyxl')
+            sheet_names = workbook.sheet_names
+            sheets = ((sheet_name, workbook.parse(sheet_name)) for sheet_name in sheet_names)
+        else:
+            # Reuse the DataFrames from the analysis pass instead of parsing the file again
+            sheet_names = list(excel_data)
+            sheets = excel_data.items()
         
         # Get the base filename without extension
         base_name = Path(excel_file).stem
         
-        # Process each sheet
-        for sheet_name, df in excel_data.items():
-            print(f"\nProcessing sheet: {sheet_name}")
-            print(f"Shape: {df.shape}")
-            print(f"Columns: {list(df.columns)}")
-            
-            # Clean sheet name for filenames
-            clean_sheet_name = sheet_name.replace(' ', '_').replace('/', '_')
-            
-            # 1. Save as CSV
-            csv_file = f"{output_dir}/{base_name}_{clean_sheet_name}.csv"
-            df.to_csv(csv_file, index=False)
-            print(f"Saved CSV: {csv_file}")
-            
-            # 2. Save as JSON
-            json_file = f"{output_dir}/{base_name}_{clean_sheet_name}.json"
-            # Convert to JSON with proper handling of NaN values
-            json_data = df.where(pd.notnull(df), None).to_dict('records')
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, indent=2, ensure_ascii=False, default=str)
-            print(f"Saved JSON: {json_file}")
-        
-        # 3. Save as SQLite database
+        # Every sheet is written to the SQLite database as it is processed
         db_file = f"{output_dir}/{base_name}.db"
-        conn = sqlite3.connect(db_file)
+        conn = sqlite3.connect(db_file, isolation_level=None)
+        # The database is regenerated from the workbook, so skip fsyncs; the journal stays
+        # in memory so a sheet that fails to load can still be rolled back
+        conn.executescript("PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF; PRAGMA temp_store=MEMORY;")
         
-        for sheet_name, df in excel_data.items():
-            # Clean table name
-            table_name = sheet_name.replace(' ', '_').replace('/', '_').lower()
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
-            print(f"Saved to database table: {table_name}")
+        try:
+            # CSV and JSON files are written on worker threads while this thread loads SQLite
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                # Process each sheet
+                for sheet_name, df in sheets:
+                    print(f"\nProcessing sheet: {sheet_name}")
+                    print(f"Shape: {df.shape}")
+                    print(f"Columns: {list(df.columns)}")
+                    
+                    # Clean sheet name for filenames
+                    clean_sheet_name = sheet_name.replace(' ', '_').replace('/', '_')
+                    
+                    # 1. Save as CSV and 2. save as JSON, in parallel
+                    csv_file = f"{output_dir}/{base_name}_{clean_sheet_name}.csv"
+                    json_file = f"{output_dir}/{base_name}_{clean_sheet_name}.json"
+                    csv_future = executor.submit(write_csv, df, csv_file)
+                    json_future = executor.submit(write_json, df, json_file)
+                    
+                    # 3. Save to the SQLite database
+                    table_name = clean_sheet_name.lower()
+                    write_sqlite_table(conn, table_name, df)
+                    print(f"Saved to database table: {table_name}")
+                    
+                    # Full-text index so keyword searches use MATCH instead of scanning with LIKE
+                    create_fts_index(conn, table_name, df)
+                    
+                    # Finish this sheet's files before parsing the next one, so only one sheet is in memory
+                    csv_future.result()
+                    print(f"Saved CSV: {csv_file}")
+                    json_future.result()
+                    print(f"Saved JSON: {json_file}")
+        finally:
+            conn.close()
         
-        conn.close()
         print(f"Saved SQLite database: {db_file}")
         
-        return excel_data
+        return sheet_names
         
     except Exception as e:
         print(f"Error processing Excel file: {e}")
         return None
+    finally:
+        if workbook is not None:
+            workbook.close()
 
 def analyze_excel_structure(excel_file):
     """
@@ -121,8 +245,8 @@ def create_database_schema(db_file):
         conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
         
-        # Get all table names
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        # Get all table names, leaving out the internal tables that back each FTS5 index
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE '%\\_fts\\_%' ESCAPE '\\';")
         tables = cursor.fetchall()
         
         print("\n" + "=" * 60)
@@ -169,7 +293,8 @@ if __name__ == "__main__":
         print("CONVERTING TO MACHINE-READABLE FORMATS")
         print("=" * 60)
         
-        convert_excel_to_formats(excel_file)
+        # Convert the sheets parsed by the analysis instead of reading the file again
+        convert_excel_to_formats(excel_file, excel_data=excel_data)
         
         # Show database schema
         db_file = "converted_data/base_template.db"
@@ -1,12 +1,76 @@
 import os
-import requests
-from typing import Dict, Any, List, Optional
+import time
+import random
+import asyncio
+import contextlib
+import threading
+import weakref
+from collections import deque
+import httpx
+import orjson
+from typing import Dict, Any, List, Optional, AsyncIterator, Sequence, Union
 from dotenv import load_dotenv
 
+from response_cache import ResponseCache
+
 load_dotenv()
 
+# Responses worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Model families whose prompt caching must be requested with cache_control markers
+PROMPT_CACHE_MARKER_PREFIXES = ("anthropic/",)
+
+# A model is skipped while more than this share of its recent requests failed,
+# judged over at most CIRCUIT_SAMPLES requests from the last CIRCUIT_WINDOW seconds
+CIRCUIT_FAILURE_RATIO = 0.5
+CIRCUIT_MIN_SAMPLES = 4
+CIRCUIT_SAMPLES = 20
+CIRCUIT_WINDOW = 300.0
+
+class ModelUnavailableError(RuntimeError):
+    """Raised instead of sending a request to a model whose recent requests mostly failed"""
+
+class OutputTruncatedError(RuntimeError):
+    """Raised at the end of a stream whose model stopped at max_tokens; the text is not cached"""
+
+# One pool configuration for the sync and async clients; idle connections are kept for a minute
+# so later calls on the same client, such as the final call after the reasoning calls, reuse
+# their TLS sessions. An async client lives for one run, so separate runs open new connections
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0)
+REQUEST_TIMEOUT = httpx.Timeout(120.0)
+
+def pooled_http_client() -> httpx.Client:
+    """Create a synchronous HTTP client with the shared pool configuration"""
+    return httpx.Client(http2=True, limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT)
+
+# A system prompt is either one string or ordered blocks, most stable first
+SystemPrompt = Union[str, Sequence[str]]
+
+def join_system_prompt(system_prompt: Optional[SystemPrompt]) -> Optional[str]:
+    """Flatten system prompt blocks into the single string sent to providers without cache markers"""
+    if system_prompt is None or isinstance(system_prompt, str):
+        return system_prompt
+    return "\n\n".join(system_prompt)
+
+def has_content(response: Dict[Any, Any]) -> bool:
+    """Whether a completion response carries message text; empty responses are never cached"""
+    choices = response.get("choices")
+    return bool(choices and choices[0].get("message", {}).get("content"))
+
+def is_truncated(response: Dict[Any, Any]) -> bool:
+    """Whether the model stopped at max_tokens; cut-off responses are never cached"""
+    choices = response.get("choices")
+    return bool(choices) and choices[0].get("finish_reason") == "length"
+
 class OpenRouterClient:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, 
+                 api_key: Optional[str] = None, 
+                 cache: Optional[ResponseCache] = None,
+                 http_client: Optional[httpx.Client] = None,
+                 max_concurrent_requests: Optional[int] = None,
+                 requests_per_minute: int = 60,
+                 max_retries: int = 4):
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
             raise ValueError("OpenRouter API key is required")
@@ -16,57 +80,375 @@ class OpenRouterClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Pooled client reused by every synchronous request; may be shared with other instances,
+        # so the auth headers are sent per request rather than set on the client
+        self.http = http_client if http_client is not None else pooled_http_client()
+        
+        # Responses to identical (model, prompt) requests are served from memory
+        self.cache = cache if cache is not None else ResponseCache()
+        
+        # Async requests are capped per event loop and rate limited across all loops;
+        # asyncio semaphores are bound to a loop, and Streamlit runs a new loop per run
+        # OPENROUTER_MAX_CONCURRENCY sets the default cap, e.g. when running many sections at once
+        if max_concurrent_requests is None:
+            max_concurrent_requests = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "8"))
+        self.max_concurrent_requests = max_concurrent_requests
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        # Recent (time, succeeded) outcomes per model for the circuit breaker
+        self._model_health: Dict[str, deque] = {}
+        self._request_times: deque = deque()
+        self._rate_lock = threading.Lock()
+        
+        # Long-lived async client opened by `async with client:`; bound to the loop that opened it
+        self._ahttp: Optional[httpx.AsyncClient] = None
+    
+    def _build_payload(self, 
+                       model: str, 
+                       prompt: str, 
+                       system_prompt: Optional[SystemPrompt],
+                       temperature: float,
+                       max_tokens: int) -> Dict[str, Any]:
+        """Build the chat completion request body"""
+        messages = []
+        if system_prompt:
+            if model.startswith(PROMPT_CACHE_MARKER_PREFIXES):
+                # Anthropic only caches prefixes explicitly marked with cache_control; a breakpoint
+                # after every block lets a request reuse the longest prefix it shares with earlier ones
+                blocks = [system_prompt] if isinstance(system_prompt, str) else system_prompt
+                content = [
+                    {"type": "text", "text": block, "cache_control": {"type": "ephemeral"}}
+                    for block in blocks
+                ]
+                messages.append({"role": "system", "content": content})
+            else:
+                # Other providers cache repeated prefixes automatically; keeping the system
+                # prompt first and byte-identical across requests is all they need
+                messages.append({"role": "system", "content": join_system_prompt(system_prompt)})
+        
+        messages.append({"role": "user", "content": prompt})
+        
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
     
     def generate_completion(self, 
                            model: str, 
                            prompt: str, 
-                           system_prompt: Optional[str] = None,
+                           system_prompt: Optional[SystemPrompt] = None,
                            temperature: float = 0.7,
-                           max_tokens: int = 40000) -> Dict[Any, Any]:
+                           max_tokens: int = 40000,
+                           use_cache: bool = True) -> Dict[Any, Any]:
         """
         Generate a completion using the specified model on OpenRouter
         """
+        cache_key = ResponseCache.make_key(model, join_system_prompt(system_prompt), prompt, temperature, max_tokens)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        self._check_circuit(model)
         url = f"{self.base_url}/chat/completions"
+        body = orjson.dumps(self._build_payload(model, prompt, system_prompt, temperature, max_tokens))
         
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.http.post(url, headers=self.headers, content=body)
+            except httpx.TransportError:
+                # Timeouts and dropped connections are as transient as a 5xx
+                if attempt == self.max_retries:
+                    self._record_outcome(model, False)
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                break
+            time.sleep(self._retry_delay(attempt, response))
         
-        messages.append({"role": "user", "content": prompt})
+        self._record_response(model, response)
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        if has_content(result) and not is_truncated(result):
+            self.cache.set(cache_key, result)
+        return result
+    
+    def _request_slot(self) -> asyncio.Semaphore:
+        """Return the concurrency semaphore for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._rate_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent_requests)
+        return semaphore
+    
+    async def _wait_for_rate_limit(self) -> None:
+        """Wait until another request fits within requests_per_minute over a sliding one-minute window"""
+        while True:
+            with self._rate_lock:
+                now = time.monotonic()
+                while self._request_times and now - self._request_times[0] >= 60.0:
+                    self._request_times.popleft()
+                
+                if len(self._request_times) < self.requests_per_minute:
+                    self._request_times.append(now)
+                    return
+                
+                wait = 60.0 - (now - self._request_times[0])
+            await asyncio.sleep(wait)
+    
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before retrying: the server's Retry-After if given, else jittered exponential backoff"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return random.uniform(0, min(30.0, 2.0 ** attempt))
+    
+    def _record_outcome(self, model: str, succeeded: bool) -> None:
+        """Remember whether a request to a model succeeded, for the circuit breaker"""
+        with self._rate_lock:
+            history = self._model_health.get(model)
+            if history is None:
+                history = self._model_health[model] = deque(maxlen=CIRCUIT_SAMPLES)
+            history.append((time.monotonic(), succeeded))
+    
+    def _record_response(self, model: str, response: httpx.Response) -> None:
+        """
+        Record a final response for the circuit breaker; client errors such as an over-long
+        prompt say nothing about the model's health and are not counted
+        """
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            self._record_outcome(model, False)
+        elif not response.is_error:
+            self._record_outcome(model, True)
+    
+    def _check_circuit(self, model: str) -> None:
+        """
+        Raise ModelUnavailableError if most recent requests to a model failed; failures older than
+        CIRCUIT_WINDOW no longer count, so a skipped model is tried again once they age out
+        """
+        with self._rate_lock:
+            history = self._model_health.get(model)
+            if not history:
+                return
+            cutoff = time.monotonic() - CIRCUIT_WINDOW
+            recent = [succeeded for at, succeeded in history if at >= cutoff]
         
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
-        }
+        failures = recent.count(False)
+        if len(recent) >= CIRCUIT_MIN_SAMPLES and failures > CIRCUIT_FAILURE_RATIO * len(recent):
+            raise ModelUnavailableError(f"{model} skipped: {failures} of its last {len(recent)} requests failed")
+    
+    def async_http_client(self) -> httpx.AsyncClient:
+        """
+        Create an async HTTP client whose connection pool is shared by all concurrent requests
+        """
+        return httpx.AsyncClient(
+            headers=self.headers,
+            http2=True,
+            limits=POOL_LIMITS,
+            timeout=REQUEST_TIMEOUT
+        )
+    
+    async def __aenter__(self) -> "OpenRouterClient":
+        """Open one async HTTP client that every async call reuses until the block exits"""
+        if self._ahttp is None:
+            self._ahttp = self.async_http_client()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Close the long-lived async HTTP client, if one is open"""
+        if self._ahttp is not None:
+            await self._ahttp.aclose()
+            self._ahttp = None
+    
+    @contextlib.asynccontextmanager
+    async def async_session(self) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        Yield the async HTTP client opened by `async with client:`, or a temporary one
+        that is closed on exit when the client has not been entered
+        """
+        if self._ahttp is not None:
+            yield self._ahttp
+        else:
+            async with self.async_http_client() as http:
+                yield http
+    
+    async def agenerate_completion(self, 
+                                   http: httpx.AsyncClient,
+                                   model: str, 
+                                   prompt: str, 
+                                   system_prompt: Optional[SystemPrompt] = None,
+                                   temperature: float = 0.7,
+                                   max_tokens: int = 40000,
+                                   use_cache: bool = True) -> Dict[Any, Any]:
+        """
+        Generate a completion asynchronously over the given HTTP client
+        """
+        cache_key = ResponseCache.make_key(model, join_system_prompt(system_prompt), prompt, temperature, max_tokens)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        response = requests.post(url, headers=self.headers, json=payload)
+        self._check_circuit(model)
+        url = f"{self.base_url}/chat/completions"
+        body = orjson.dumps(self._build_payload(model, prompt, system_prompt, temperature, max_tokens))
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._request_slot():
+                    await self._wait_for_rate_limit()
+                    response = await http.post(url, content=body)
+            except httpx.TransportError:
+                # Timeouts and dropped connections are as transient as a 5xx
+                if attempt == self.max_retries:
+                    self._record_outcome(model, False)
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                break
+            await asyncio.sleep(self._retry_delay(attempt, response))
+        
+        self._record_response(model, response)
         response.raise_for_status()
-        return response.json()
+        result = orjson.loads(response.content)
+        if has_content(result) and not is_truncated(result):
+            self.cache.set(cache_key, result)
+        return result
+    
+    async def astream_completion(self, 
+                                 http: httpx.AsyncClient,
+                                 model: str, 
+                                 prompt: str, 
+                                 system_prompt: Optional[SystemPrompt] = None,
+                                 temperature: float = 0.7,
+                                 max_tokens: int = 40000,
+                                 use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Stream a completion over the given HTTP client, yielding content deltas as they arrive;
+        raises OutputTruncatedError after the last delta if the model stopped at max_tokens
+        """
+        cache_key = ResponseCache.make_key(model, join_system_prompt(system_prompt), prompt, temperature, max_tokens)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached['choices'][0]['message']['content']
+                return
+        
+        self._check_circuit(model)
+        url = f"{self.base_url}/chat/completions"
+        payload = self._build_payload(model, prompt, system_prompt, temperature, max_tokens)
+        payload["stream"] = True
+        body = orjson.dumps(payload)
+        
+        content = []
+        finish_reason = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                delay = None
+                try:
+                    async with self._request_slot():
+                        await self._wait_for_rate_limit()
+                        async with http.stream("POST", url, content=body) as response:
+                            # Nothing has been yielded yet, so a retryable status can still be retried
+                            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                                delay = self._retry_delay(attempt, response)
+                            else:
+                                response.raise_for_status()
+                                async for line in response.aiter_lines():
+                                    # Server-sent events; lines starting with ':' are keep-alive comments
+                                    if not line.startswith("data: "):
+                                        continue
+                                    data = line[len("data: "):]
+                                    if data == "[DONE]":
+                                        break
+                                    
+                                    chunk = orjson.loads(data)
+                                    if "error" in chunk:
+                                        raise RuntimeError(chunk["error"].get("message", "Streaming request failed"))
+                                    
+                                    choices = chunk.get("choices")
+                                    if choices:
+                                        finish_reason = choices[0].get("finish_reason") or finish_reason
+                                        delta = choices[0].get("delta", {}).get("content")
+                                        if delta:
+                                            content.append(delta)
+                                            yield delta
+                except httpx.TransportError:
+                    # A dropped connection can only be retried before any content was yielded
+                    if content or attempt == self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt)
+                
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+        except httpx.HTTPStatusError as e:
+            self._record_response(model, e.response)
+            raise
+        except Exception:
+            self._record_outcome(model, False)
+            raise
+        self._record_outcome(model, True)
+        
+        if finish_reason == "length":
+            # The model is healthy, but the text is cut off; callers may retry with a larger max_tokens
+            raise OutputTruncatedError(f"{model} stopped at max_tokens={max_tokens}")
+        if content:
+            self.cache.set(cache_key, {"choices": [{"message": {"content": "".join(content)}}]})
+    
+    async def aprocess_markdown(self, 
+                                markdown_text: str, 
+                                models: List[str],
+                                system_prompt: SystemPrompt,
+                                http: Optional[httpx.AsyncClient] = None) -> Dict[str, str]:
+        """
+        Process markdown text through multiple models concurrently and return their responses
+        
+        The chat completions API takes one model per request and OpenRouter has no cross-model
+        batch endpoint, so this fans out one request per distinct model; over HTTP/2 they are
+        multiplexed on a single connection, which is where batching would save round trips
+        """
+        if http is None:
+            async with self.async_session() as http:
+                return await self.aprocess_markdown(markdown_text, models, system_prompt, http)
+        
+        # A model listed twice is only asked once
+        models = list(dict.fromkeys(models))
+        responses = await asyncio.gather(
+            *[self.agenerate_completion(http, model, markdown_text, system_prompt) for model in models],
+            return_exceptions=True
+        )
+        
+        results = {}
+        for model, response in zip(models, responses):
+            if isinstance(response, Exception):
+                results[model] = f"Error: {str(response)}"
+            elif 'choices' in response and len(response['choices']) > 0:
+                results[model] = response['choices'][0]['message']['content']
+            else:
+                results[model] = "Error: No content in response"
+        
+        return results
     
     def process_markdown(self, 
                         markdown_text: str, 
                         models: List[str],
-                        system_prompt: str) -> Dict[str, str]:
+                        system_prompt: SystemPrompt) -> Dict[str, str]:
         """
         Process markdown text through multiple models and return their responses
         """
-        results = {}
-        
-        for model in models:
-            try:
-                response = self.generate_completion(
-                    model=model,
-                    prompt=markdown_text,
-                    system_prompt=system_prompt
-                )
-                
-                if 'choices' in response and len(response['choices']) > 0:
-                    results[model] = response['choices'][0]['message']['content']
-                else:
-                    results[model] = "Error: No content in response"
-            except Exception as e:
-                results[model] = f"Error: {str(e)}"
-        
-        return results 
\ No newline at end of file
+        return asyncio.run(self.aprocess_markdown(markdown_text, models, system_prompt)) 
\ No newline at end of file
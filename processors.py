@@ -1,23 +1,36 @@
-from typing import Dict, List, Any, Tuple
-import concurrent.futures
+from typing import Dict, List, Any, Tuple, Callable, Optional, Sequence, Iterator, AsyncIterator, TYPE_CHECKING
+import asyncio
+import contextlib
+import difflib
+import functools
+import hashlib
+import itertools
 import time
-import json
 import os
-from openrouter_client import OpenRouterClient
+import re
 
-# Constants for models
-REASONING_MODELS = [
+import orjson
+
+if TYPE_CHECKING:
+    # Only needed for annotations; keeps httpx off the import path of CLI commands that never call a model
+    from openrouter_client import OpenRouterClient
+
+# Constants for models; tuples so no caller can change the defaults shared by every request
+REASONING_MODELS = (
     "openai/gpt-4.1",
     "anthropic/claude-sonnet-4",
     "google/gemini-2.5-flash-preview-05-20",
     "x-ai/grok-3-beta",
     "meta-llama/llama-4-maverick"
-]
+)
 
 FINAL_MODEL = "anthropic/claude-sonnet-4"
 
+# Key under which the final model's processing time is recorded next to the reasoning models
+FINAL_TIMING_KEY = f"Final ({FINAL_MODEL})"
+
 # List of available memo sections
-MEMO_SECTIONS = [
+MEMO_SECTIONS = (
     "Customer Discovery",
     "Product and Technology",
     "Market Research",
@@ -28,14 +41,15 @@ MEMO_SECTIONS = [
     "Financial Modelling",
     "Team and Talents",
     "Legal and IP"
-]
+)
 
+@functools.lru_cache(maxsize=None)
 def load_template_examples() -> Dict[str, Dict[str, str]]:
-    """Load template examples from the JSON file"""
+    """Load template examples from the JSON file, once, the first time prompts are generated"""
     try:
         json_path = os.path.join("converted_data", "base_template_Sheet1.json")
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(json_path, 'rb') as f:
+            data = orjson.loads(f.read())
         
         # Extract the two main objects
         general_instructions = data[0]  # "Chapter General Instructions"
@@ -61,9 +75,6 @@ def load_template_examples() -> Dict[str, Dict[str, str]]:
             }
         }
 
-# Load template examples from JSON file
-TEMPLATE_EXAMPLES = load_template_examples()
-
 # Friendly display names for models
 MODEL_DISPLAY_NAMES = {
     "openai/gpt-4.1": "GPT-4.1 (Analyst)",
@@ -131,6 +142,14 @@ Respond with exactly this format:
 [Your final optimized section instructions here]
 """
 
+# Editing criteria shared by the single-section and batched system prompts
+EDITING_CRITERIA = """1. Removing unnecessary details while preserving key insights
+2. Sharpening the analysis and reasoning
+3. Improving clarity and readability
+4. Maintaining a professional and analytical tone
+5. Highlighting the most important information for investment decisions
+"""
+
 # Base system prompt
 BASE_REASONING_SYSTEM_PROMPT = """
 You are an expert editor for venture capital investment memos. Your task is to edit the provided markdown text to make it more succinct and readable, similar to what you would read at top VC firms like Sequoia or A16Z.
@@ -138,12 +157,7 @@ You are an expert editor for venture capital investment memos. Your task is to e
 This text is a SECTION from a market report, specifically the {section_type} section. Your task is to edit it to be an excellent {section_type} SECTION of a venture capital memo, not a complete memo itself.
 
 Focus on:
-1. Removing unnecessary details while preserving key insights
-2. Sharpening the analysis and reasoning
-3. Improving clarity and readability
-4. Maintaining a professional and analytical tone
-5. Highlighting the most important information for investment decisions
-6. Following the style and format appropriate for a {section_type} section
+""" + EDITING_CRITERIA + """6. Following the style and format appropriate for a {section_type} section
 
 The goal is to transform verbose content into a clear, compelling, and concise {section_type} section of an investment analysis.
 """
@@ -245,40 +259,258 @@ Your task is to create a final, optimal version that:
 5. Focuses specifically on what makes an excellent {section_type} section
 
 The result should be a polished, professional {section_type} section that presents the key information efficiently.
+
+Some versions may be given as a unified diff against the original text instead of in full; read them as the original with those changes applied.
+"""
+
+# System prompts for every known section, formatted once so each request sends byte-identical text
+FULL_SECTION_PROMPTS = {
+    section: (BASE_REASONING_SYSTEM_PROMPT.format(section_type=section), SECTION_SPECIFIC_PROMPTS[section])
+    for section in MEMO_SECTIONS
+}
+FINAL_SECTION_PROMPTS = {section: FINAL_SYSTEM_PROMPT.format(section_type=section) for section in MEMO_SECTIONS}
+
+# Output budget for editing calls: editing rarely lengthens a text, so the budget follows the input
+MAX_OUTPUT_TOKENS = 4000
+MIN_OUTPUT_TOKENS = 512
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, at about four characters per token"""
+    return len(text) // 4
+
+# Appended to an output that was still cut off at MAX_OUTPUT_TOKENS, so readers and the final model see it
+TRUNCATED_OUTPUT_NOTE = "\n\n[Output cut off at the token limit]"
+
+def output_token_budget(text: str, ratio: float = 1.5) -> int:
+    """max_tokens for an edit of text: ratio times its estimated length, within the fixed bounds"""
+    return min(MAX_OUTPUT_TOKENS, max(MIN_OUTPUT_TOKENS, int(estimate_tokens(text) * ratio)))
+
+# Context window of FINAL_MODEL, and how much of it one model's edit may take up in the final prompt
+FINAL_CONTEXT_TOKENS = 200000
+EDIT_TOKEN_RATIO = 2.0
+MIN_EDIT_TOKENS = 1500
+TRUNCATION_MARKER = "\n…[truncated]…\n"
+
+def truncate_to_tokens(text: str, max_tokens: int, head_ratio: float = 0.6) -> str:
+    """Cut text to about max_tokens, keeping its beginning and end and marking the cut"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * head_ratio)
+    return text[:head] + TRUNCATION_MARKER + text[len(text) - (max_chars - head):]
+
+def edit_token_budget(original_text: str, system_prompt: str, num_edits: int) -> int:
+    """
+    Tokens each of num_edits edits may use in the final prompt: a fair share of the context
+    left after the original, the system prompt and the output, and at most EDIT_TOKEN_RATIO
+    times the original, since an edit much longer than its input is a runaway generation
+    """
+    available = FINAL_CONTEXT_TOKENS - estimate_tokens(original_text) - estimate_tokens(system_prompt) - MAX_OUTPUT_TOKENS
+    share = available // max(num_edits, 1)
+    return max(0, min(share, max(MIN_EDIT_TOKENS, int(estimate_tokens(original_text) * EDIT_TOKEN_RATIO))))
+
+def is_error_output(output: str) -> bool:
+    """Whether a model's output is an error placeholder rather than an edit"""
+    return not output or output.startswith("Error")
+
+# What run_pipeline does with models still running when the final call starts early
+STRAGGLER_POLICIES = ("keep", "cancel", "restart")
+
+# When this many reasoning models return near-identical edits, the final model is skipped
+CONSENSUS_MIN_MODELS = 3
+CONSENSUS_SIMILARITY = 0.9
+
+def find_consensus(outputs: Dict[str, str], min_models: int = CONSENSUS_MIN_MODELS, similarity: float = CONSENSUS_SIMILARITY) -> Optional[str]:
+    """
+    Return the model whose output is closest to the rest of a group of at least min_models outputs
+    with pairwise word-level similarity of at least `similarity`, or None when no such group exists
+    """
+    candidates = [model for model, output in outputs.items() if not is_error_output(output)]
+    if len(candidates) < min_models:
+        return None
+    
+    words = [outputs[model].split() for model in candidates]
+    ratios = {}
+    for i, j in itertools.combinations(range(len(words)), 2):
+        matcher = difflib.SequenceMatcher(None, words[i], words[j], autojunk=False)
+        # quick_ratio is a cheap upper bound, so clearly different pairs skip the full comparison
+        ratios[i, j] = matcher.ratio() if matcher.quick_ratio() >= similarity else 0.0
+    
+    best, best_score = None, -1.0
+    for group in itertools.combinations(range(len(words)), min_models):
+        pairs = list(itertools.combinations(group, 2))
+        if all(ratios[pair] >= similarity for pair in pairs):
+            # The medoid is the member with the highest total similarity to the others
+            for member in group:
+                score = sum(ratios[pair] for pair in pairs if member in pair)
+                if score > best_score:
+                    best, best_score = candidates[member], score
+    return best
+
+def find_duplicate_outputs(outputs: Dict[str, str]) -> Dict[str, str]:
+    """
+    Map each model whose output is byte-identical to an earlier model's output to that earlier model,
+    so repeated outputs are sent to the final model only once
+    """
+    first_seen = {}
+    duplicates = {}
+    for model, output in outputs.items():
+        digest = hashlib.blake2b(output.encode("utf-8"), digest_size=16).digest()
+        if digest in first_seen:
+            duplicates[model] = first_seen[digest]
+        else:
+            first_seen[digest] = model
+    return duplicates
+
+def format_edited_version(model: str, original_text: str, output: str) -> str:
+    """
+    Format one model's edit for the final prompt, as a unified diff against the original
+    when that is shorter than the edited text, and in full when most of the text was rewritten
+    """
+    diff = "\n".join(difflib.unified_diff(
+        original_text.splitlines(), output.splitlines(), "original", model, n=2, lineterm=""
+    ))
+    if diff and len(diff) < len(output):
+        return f"EDITED BY {model} (unified diff against the original):\n\n{diff}\n\n"
+    return f"EDITED BY {model}:\n\n{output}\n\n"
+
+# Sections packed into one request per model by process_all_sections(batch_sections=True)
+BATCH_MAX_SECTIONS = 4
+BATCH_MAX_INPUT_TOKENS = 6000
+
+BATCH_SYSTEM_PROMPT = """
+You are an expert editor for venture capital investment memos. Your task is to edit each of the provided markdown sections to make it more succinct and readable, similar to what you would read at top VC firms like Sequoia or A16Z.
+
+Each text is a single SECTION of a memo, named in its tag. Edit it to be an excellent SECTION of that type, not a complete memo itself, and keep each section separate from the others.
+
+For every section, focus on:
+""" + EDITING_CRITERIA + """6. Following the style and format appropriate for its section type
+
+The goal is to transform verbose content into clear, compelling, and concise sections of an investment analysis.
+
+Follow the guidance below for each section type.
+
+Return every edited section wrapped in <section name="...">...</section> tags with the same name as its input, in the same order, with nothing outside the tags.
 """
 
+# The two prompts in a consolidated prompt-generation reply, captured in one pass
+FINAL_PROMPTS_PATTERN = re.compile(r"\*\*CHAPTER GENERAL PROMPT:\*\*(.*?)\*\*SECTION INSTRUCTIONS:\*\*(.*)", re.DOTALL)
+
+SECTION_TAG_PATTERN = re.compile(r'<section name="([^"]+)">\s*(.*?)\s*</section>', re.DOTALL)
+
+def plan_section_batches(sections: Dict[str, str]) -> List[List[str]]:
+    """
+    Group section names into batches of at most BATCH_MAX_SECTIONS whose combined estimated
+    input stays under BATCH_MAX_INPUT_TOKENS; a section over the limit gets a batch of its own
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for section_type, markdown_text in sections.items():
+        tokens = estimate_tokens(markdown_text)
+        if batch and (len(batch) >= BATCH_MAX_SECTIONS or batch_tokens + tokens > BATCH_MAX_INPUT_TOKENS):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(section_type)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def get_batch_system_prompt(sections: Dict[str, str]) -> Tuple[str, ...]:
+    """System prompt blocks for a batched request: the fixed instructions, then each section's guidance"""
+    guidance = [
+        f"Guidance for the {section_type} section:{SECTION_SPECIFIC_PROMPTS[section_type]}"
+        for section_type in sections if section_type in SECTION_SPECIFIC_PROMPTS
+    ]
+    return (BATCH_SYSTEM_PROMPT, "\n".join(guidance)) if guidance else (BATCH_SYSTEM_PROMPT,)
+
+def build_batch_prompt(sections: Dict[str, str]) -> str:
+    """Wrap each section's text in a named tag"""
+    return "\n\n".join(f'<section name="{section_type}">\n{markdown_text}\n</section>' for section_type, markdown_text in sections.items())
+
+def parse_batch_output(text: str) -> Dict[str, str]:
+    """Split a batched reply back into {section_type: edited_text}"""
+    return {name: body for name, body in SECTION_TAG_PATTERN.findall(text)}
+
 class MarkdownProcessor:
-    def __init__(self, client: OpenRouterClient):
+    def __init__(self, client: "OpenRouterClient"):
         self.client = client
     
-    def get_section_prompt(self, section_type: str) -> str:
-        """Generate a section-specific system prompt"""
-        # Get the base prompt with the section type inserted
-        section_prompt = BASE_REASONING_SYSTEM_PROMPT.format(section_type=section_type)
+    def get_section_prompt(self, section_type: str) -> Tuple[str, ...]:
+        """
+        Generate a section-specific system prompt as ordered blocks, most stable first,
+        so providers can cache the base prompt separately from the section guidance
+        """
+        blocks = FULL_SECTION_PROMPTS.get(section_type)
+        if blocks is None:
+            # Sections without specific guidance get the base prompt alone
+            blocks = (BASE_REASONING_SYSTEM_PROMPT.format(section_type=section_type),)
+        return blocks
+    
+    async def _acomplete_once(self, http, model: str, prompt: str, system_prompt, max_tokens: int, use_cache: bool, on_text: Optional[Callable[[str], None]] = None) -> Tuple[str, bool]:
+        """
+        Run one completion, streamed through on_text(text_so_far) when given
+        Returns (text, truncated), where truncated means the model stopped at max_tokens
+        """
+        if on_text is None:
+            response = await self.client.agenerate_completion(
+                http,
+                model=model,
+                prompt=prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                use_cache=use_cache
+            )
+            if 'choices' in response and len(response['choices']) > 0:
+                choice = response['choices'][0]
+                return choice['message']['content'], choice.get('finish_reason') == "length"
+            return "", False
         
-        # Add section-specific guidance if available
-        if section_type in SECTION_SPECIFIC_PROMPTS:
-            section_prompt += "\n\n" + SECTION_SPECIFIC_PROMPTS[section_type]
-            
-        return section_prompt
+        # Imported here so the CLI's list and view commands never load the HTTP client stack
+        from openrouter_client import OutputTruncatedError
+        text = ""
+        try:
+            async for delta in self.client.astream_completion(
+                http,
+                model=model,
+                prompt=prompt,
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                use_cache=use_cache
+            ):
+                text += delta
+                on_text(text)
+        except OutputTruncatedError:
+            return text, True
+        return text, False
+    
+    async def _agenerate_text(self, http, model: str, prompt: str, system_prompt, max_tokens: int, use_cache: bool = True, on_text: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Generate a completion's text; a text cut off at an estimated max_tokens is generated again
+        with MAX_OUTPUT_TOKENS, and one still cut off after that ends with TRUNCATED_OUTPUT_NOTE
+        """
+        text, truncated = await self._acomplete_once(http, model, prompt, system_prompt, max_tokens, use_cache, on_text)
+        if truncated and max_tokens < MAX_OUTPUT_TOKENS:
+            # The budget estimated from the input was too small for this text
+            text, truncated = await self._acomplete_once(http, model, prompt, system_prompt, MAX_OUTPUT_TOKENS, use_cache, on_text)
+        if truncated and text:
+            text += TRUNCATED_OUTPUT_NOTE
+        return text
     
-    def process_model(self, model, markdown_text, section_type: str) -> Tuple[str, float]:
-        """Helper function to process a single model and return result with timing"""
+    async def aprocess_model(self, http, model, markdown_text, section_type: str, use_cache: bool = True, on_update: Optional[Callable[[str, str], None]] = None) -> Tuple[str, float]:
+        """
+        Helper coroutine to process a single model and return result with timing
+        When on_update is given the response is streamed and on_update(model, text_so_far) is called per chunk
+        """
         start_time = time.time()
         try:
             # Get the section-specific system prompt
             system_prompt = self.get_section_prompt(section_type)
+            on_text = None if on_update is None else (lambda text: on_update(model, text))
             
-            response = self.client.generate_completion(
-                model=model,
-                prompt=markdown_text,
-                system_prompt=system_prompt,
-                max_tokens=4000
+            result = await self._agenerate_text(
+                http, model, markdown_text, system_prompt, output_token_budget(markdown_text), use_cache, on_text
             )
-            
-            if 'choices' in response and len(response['choices']) > 0:
-                result = response['choices'][0]['message']['content']
-            else:
+            if not result:
                 result = "Error: No content in response"
         except Exception as e:
             result = f"Error: {str(e)}"
@@ -287,113 +519,430 @@ class MarkdownProcessor:
         processing_time = time.time() - start_time
         return result, processing_time
     
-    def process_with_reasoning_models(self, markdown_text: str, section_type: str, selected_models: List[str] = None) -> Dict[str, Dict[str, Any]]:
+    async def aiter_reasoning_outputs(self, markdown_text: str, section_type: str, selected_models: Sequence[str] = REASONING_MODELS, use_cache: bool = True) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
         """
-        Process the markdown text through all reasoning models in parallel
-        Returns a dictionary with model name as key and a dict with 'output' and 'time' as value
+        Process the markdown text through all reasoning models concurrently and yield
+        (model, {'output', 'time'}) as each model finishes; closing the generator early
+        cancels the models still running
         """
-        if selected_models is None:
-            selected_models = REASONING_MODELS
-        
-        # Use ThreadPoolExecutor for parallel processing
-        results = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(selected_models), 6)) as executor:
-            # Create futures with section_type
-            future_to_model = {
-                executor.submit(self.process_model, model, markdown_text, section_type): model 
-                for model in selected_models
-            }
-            
-            # Process results as they complete
-            for future in concurrent.futures.as_completed(future_to_model):
-                model = future_to_model[future]
+        # One HTTP client for the whole fan-out so every request shares its connection pool
+        async with self.client.async_session() as http:
+            async def run_model(model):
                 try:
-                    output, processing_time = future.result()
-                    results[model] = {
+                    output, processing_time = await self.aprocess_model(http, model, markdown_text, section_type, use_cache)
+                except Exception as e:
+                    output, processing_time = f"Error: {str(e)}", 0.0
+                return model, output, processing_time
+            
+            tasks = [asyncio.ensure_future(run_model(model)) for model in selected_models]
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    model, output, processing_time = await next_result
+                    yield model, {
                         'output': output,
                         'time': processing_time
                     }
-                except Exception as e:
-                    results[model] = {
-                        'output': f"Error: {str(e)}",
-                        'time': 0.0
-                    }
-        
-        return results
+            finally:
+                for task in tasks:
+                    task.cancel()
+    
+    async def aprocess_with_reasoning_models(self, markdown_text: str, section_type: str, selected_models: Sequence[str] = REASONING_MODELS, use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Process the markdown text through all reasoning models concurrently
+        Returns a dictionary with model name as key and a dict with 'output' and 'time' as value
+        """
+        finished = {model: data async for model, data in self.aiter_reasoning_outputs(markdown_text, section_type, selected_models, use_cache)}
+        # Keep the selected order regardless of which model finished first
+        return {model: finished[model] for model in selected_models if model in finished}
     
-    def create_final_version(self, original_text: str, model_outputs: Dict[str, Dict[str, Any]], section_type: str) -> Tuple[str, float]:
+    def iter_reasoning_outputs(self, markdown_text: str, section_type: str, selected_models: Sequence[str] = REASONING_MODELS, use_cache: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Synchronous counterpart of aiter_reasoning_outputs for callers without an event loop:
+        yields (model, {'output', 'time'}) as each model finishes, so the fastest edits can be
+        shown before the slowest model returns; closing the generator early cancels the rest
+        """
+        # The models keep running on this private loop only while the caller waits for the next result
+        loop = asyncio.new_event_loop()
+        results = self.aiter_reasoning_outputs(markdown_text, section_type, selected_models, use_cache)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            try:
+                loop.run_until_complete(results.aclose())
+                # Let cancelled model calls unwind before the loop goes away
+                pending = asyncio.all_tasks(loop)
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+    
+    def process_with_reasoning_models(self, markdown_text: str, section_type: str, selected_models: Sequence[str] = REASONING_MODELS, use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Synchronous wrapper around aprocess_with_reasoning_models for callers without an event loop
+        """
+        return asyncio.run(self.aprocess_with_reasoning_models(markdown_text, section_type, selected_models, use_cache))
+    
+    async def acreate_final_version(self, original_text: str, model_outputs: Dict[str, Dict[str, Any]], section_type: str, use_cache: bool = True) -> Tuple[str, Optional[float]]:
         """
         Create the final version using all the model outputs
+        Returns the final output and the processing time, which is None when most models
+        agreed and the consensus output was returned without calling the final model
+        """
+        # The prompt is assembled by afinalize as one list of parts joined once
+        async with self.client.async_session() as http:
+            final_output, final_time, _ = await self.afinalize(
+                http,
+                original_text,
+                section_type,
+                {model: output_data['output'] for model, output_data in model_outputs.items()},
+                use_cache
+            )
+        return final_output, final_time
+    
+    def create_final_version(self, original_text: str, model_outputs: Dict[str, Dict[str, Any]], section_type: str, use_cache: bool = True) -> Tuple[str, Optional[float]]:
+        """
+        Synchronous wrapper around acreate_final_version for callers without an event loop
+        """
+        return asyncio.run(self.acreate_final_version(original_text, model_outputs, section_type, use_cache))
+    
+    async def acall_final_model(self, http, combined_prompt: str, section_type: str, use_cache: bool = True, on_update: Optional[Callable[[str], None]] = None, max_tokens: int = MAX_OUTPUT_TOKENS) -> Tuple[str, float]:
+        """
+        Send an already-built consolidation prompt to the final model over the given HTTP client
+        When on_update is given the response is streamed and on_update(text_so_far) is called per chunk
         Returns the final output and the processing time
         """
-        # Create prompt for the final model
-        combined_prompt = "ORIGINAL TEXT:\n\n" + original_text + "\n\n"
-        
-        for model, output_data in model_outputs.items():
-            combined_prompt += f"EDITED BY {model}:\n\n{output_data['output']}\n\n"
-        
-        combined_prompt += f"Based on these versions, create the optimal final version that incorporates the best elements from each to create an excellent {section_type} section for a venture capital memo."
-        
         start_time = time.time()
         try:
             # Get the final system prompt with section type
-            final_system_prompt = FINAL_SYSTEM_PROMPT.format(section_type=section_type)
+            final_system_prompt = FINAL_SECTION_PROMPTS.get(section_type) or FINAL_SYSTEM_PROMPT.format(section_type=section_type)
             
-            response = self.client.generate_completion(
-                model=FINAL_MODEL,
-                prompt=combined_prompt,
-                system_prompt=final_system_prompt,
-                max_tokens=4000
+            result = await self._agenerate_text(
+                http, FINAL_MODEL, combined_prompt, final_system_prompt, max_tokens, use_cache, on_update
             )
-            
-            if 'choices' in response and len(response['choices']) > 0:
-                result = response['choices'][0]['message']['content']
-            else:
+            if not result:
                 result = "Error: Could not generate final version."
         except Exception as e:
             result = f"Error generating final version: {str(e)}"
             
         # Calculate processing time in seconds
         processing_time = time.time() - start_time
-        return result, processing_time 
+        return result, processing_time
+    
+    async def afinalize(self, 
+                        http, 
+                        original_text: str, 
+                        section_type: str, 
+                        outputs: Dict[str, str], 
+                        use_cache: bool = True, 
+                        on_update: Optional[Callable[[str], None]] = None,
+                        edited_parts: Optional[Dict[str, str]] = None) -> Tuple[str, Optional[float], Optional[str]]:
+        """
+        Produce the final version from the reasoning outputs, given as {model: output} in prompt order,
+        returning a consensus output directly when most models agree.
+        edited_parts may hold prompt parts already formatted with format_edited_version
+        Returns (final_output, final_time, consensus_model); with a consensus, final_time is None
+        since the final model was never called, and consensus_model is the model whose output was picked
+        """
+        # Failed models have nothing to contribute; an error string would only mislead the final model
+        outputs = {model: output for model, output in outputs.items() if not is_error_output(output)}
+        
+        # Near-identical edits from most models need no consolidation
+        consensus_model = find_consensus(outputs)
+        if consensus_model is not None:
+            if on_update is not None:
+                on_update(outputs[consensus_model])
+            return outputs[consensus_model], None, consensus_model
+        
+        prompt_parts = ["ORIGINAL TEXT:\n\n", original_text, "\n\n"]
+        duplicates = find_duplicate_outputs(outputs)
+        # One runaway output must not push the final prompt past the context window or the budget
+        final_system_prompt = FINAL_SECTION_PROMPTS.get(section_type) or FINAL_SYSTEM_PROMPT.format(section_type=section_type)
+        max_edit_tokens = edit_token_budget(original_text, final_system_prompt, len(outputs) - len(duplicates))
+        for model, output in outputs.items():
+            if model in duplicates:
+                prompt_parts.append(f"EDITED BY {model}: identical to the version edited by {duplicates[model]}\n\n")
+            elif edited_parts is not None and model in edited_parts:
+                prompt_parts.append(truncate_to_tokens(edited_parts[model], max_edit_tokens))
+            else:
+                prompt_parts.append(truncate_to_tokens(format_edited_version(model, original_text, output), max_edit_tokens))
+        prompt_parts.append(f"Based on these versions, create the optimal final version that incorporates the best elements from each to create an excellent {section_type} section for a venture capital memo.")
+        final_output, final_time = await self.acall_final_model(
+            http, "".join(prompt_parts), section_type, use_cache, on_update, output_token_budget(original_text)
+        )
+        return final_output, final_time, None
+    
+    async def run_pipeline(self, 
+                           markdown_text: str, 
+                           section_type: str, 
+                           selected_models: Sequence[str] = REASONING_MODELS, 
+                           use_cache: bool = True,
+                           on_update: Optional[Callable[[str, str], None]] = None,
+                           on_final_update: Optional[Callable[[str], None]] = None,
+                           on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                           min_outputs: Optional[int] = None,
+                           straggler_wait: float = 2.0,
+                           straggler_policy: str = "keep",
+                           http=None) -> Tuple[Dict[str, Dict[str, Any]], str, Optional[float]]:
+        """
+        Run the reasoning models and the final consolidation on one HTTP client.
+        Each reasoning output is formatted as it arrives, so the final call is sent the
+        moment the slowest reasoning model returns. The outputs are joined in selected_models
+        order, so a repeated run produces the same final prompt and can be served from the cache.
+        With min_outputs set, the final call starts once that many models have returned and the
+        rest have had straggler_wait more seconds; later outputs are still collected and returned
+        but are not part of the final version (straggler_policy "keep"). With "cancel", models still
+        running at that point are cancelled instead and reported with an error output, and at least
+        two outputs are always waited for. With "restart", if every straggler returns before the
+        final version is done, the final call is restarted with all outputs.
+        Pass on_update / on_final_update to stream partial outputs as they are generated,
+        and on_result to be told (model, {'output', 'time'}) as each model finishes.
+        Pass http to run on an HTTP client the caller already holds.
+        Returns (model_outputs, final_output, final_time). When most models agreed, the final model
+        is not called: final_time is None and the picked model's entry has 'consensus': True
+        """
+        if straggler_policy not in STRAGGLER_POLICIES:
+            raise ValueError(f"straggler_policy must be one of {', '.join(STRAGGLER_POLICIES)}")
+        needed = len(selected_models) if min_outputs is None else min(max(min_outputs, 2 if straggler_policy == "cancel" else 1), len(selected_models))
+        
+        async with contextlib.nullcontext(http) if http is not None else self.client.async_session() as http:
+            async def run_model(model):
+                output, processing_time = await self.aprocess_model(http, model, markdown_text, section_type, use_cache, on_update)
+                return model, output, processing_time
+            
+            results = {}
+            edited_parts = {}
+            
+            def record(task):
+                model, output, processing_time = task.result()
+                results[model] = {
+                    'output': output,
+                    'time': processing_time
+                }
+                edited_parts[model] = format_edited_version(model, markdown_text, output)
+                if on_result is not None:
+                    on_result(model, results[model])
+            
+            loop = asyncio.get_running_loop()
+            start_time = time.time()
+            pending = {asyncio.ensure_future(run_model(model)) for model in selected_models}
+            final_task = None
+            try:
+                deadline = None
+                while pending:
+                    timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                    done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        record(task)
+                    
+                    if len(results) >= needed:
+                        if deadline is None:
+                            deadline = loop.time() + straggler_wait
+                        if not done or loop.time() >= deadline:
+                            break
+                
+                if straggler_policy == "cancel" and pending:
+                    # Free the request slots and stop paying for outputs the final version will not use
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.wait(pending)
+                    pending = set()
+                    for model in selected_models:
+                        if model not in results:
+                            results[model] = {
+                                'output': "Error: Cancelled because the final version started without it",
+                                'time': time.time() - start_time
+                            }
+                            if on_result is not None:
+                                on_result(model, results[model])
+                
+                def finalize():
+                    return asyncio.ensure_future(self.afinalize(
+                        http,
+                        markdown_text,
+                        section_type,
+                        {model: results[model]['output'] for model in selected_models if model in edited_parts},
+                        use_cache,
+                        on_final_update,
+                        edited_parts
+                    ))
+                
+                final_task = finalize()
+                # Stragglers keep running alongside the final call and are reported as they finish
+                while pending and not final_task.done():
+                    done, _ = await asyncio.wait(pending | {final_task}, return_when=asyncio.FIRST_COMPLETED)
+                    finished = done - {final_task}
+                    pending -= finished
+                    for task in finished:
+                        record(task)
+                    if straggler_policy == "restart" and not pending and not final_task.done():
+                        # Every straggler arrived before the final version was done; redo it with all outputs
+                        final_task.cancel()
+                        final_task = finalize()
+                final_output, final_time, consensus_model = await final_task
+                if consensus_model is not None:
+                    results[consensus_model]['consensus'] = True
+                
+                # Collect the stragglers still running for display and storage
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        record(task)
+            finally:
+                for task in pending:
+                    task.cancel()
+                if final_task is not None:
+                    final_task.cancel()
+        
+        return results, final_output, final_time
+    
+    async def aprocess_model_batch(self, http, model: str, sections: Dict[str, str], use_cache: bool = True) -> Dict[str, Tuple[str, float]]:
+        """
+        Edit several sections with one request to a model, given as {section_type: markdown_text}.
+        Sections missing from the reply, or all of them if the request fails, are sent again one by one
+        Returns {section_type: (output, processing_time)}
+        """
+        if len(sections) == 1:
+            section_type, markdown_text = next(iter(sections.items()))
+            return {section_type: await self.aprocess_model(http, model, markdown_text, section_type, use_cache)}
+        
+        start_time = time.time()
+        parsed = {}
+        try:
+            response = await self.client.agenerate_completion(
+                http,
+                model=model,
+                prompt=build_batch_prompt(sections),
+                system_prompt=get_batch_system_prompt(sections),
+                max_tokens=sum(output_token_budget(markdown_text) for markdown_text in sections.values()),
+                use_cache=use_cache
+            )
+            if 'choices' in response and len(response['choices']) > 0:
+                parsed = parse_batch_output(response['choices'][0]['message']['content'])
+        except Exception:
+            pass
+        processing_time = time.time() - start_time
+        
+        results = {section_type: (parsed[section_type], processing_time) for section_type in sections if parsed.get(section_type)}
+        missing = [section_type for section_type in sections if section_type not in results]
+        outcomes = await asyncio.gather(*[
+            self.aprocess_model(http, model, sections[section_type], section_type, use_cache)
+            for section_type in missing
+        ])
+        results.update(zip(missing, outcomes))
+        return results
+    
+    async def process_all_sections(self, 
+                                   sections: Dict[str, str], 
+                                   selected_models: Sequence[str] = REASONING_MODELS, 
+                                   use_cache: bool = True,
+                                   batch_sections: bool = False) -> Dict[str, Tuple[Dict[str, Dict[str, Any]], str, Optional[float]]]:
+        """
+        Run the full pipeline for several sections at once, given as {section_type: markdown_text}.
+        Every model call of every section shares one HTTP client and the client's concurrency cap
+        (OPENROUTER_MAX_CONCURRENCY), so calls from different sections interleave instead of
+        each section waiting for the previous one.
+        With batch_sections, short sections are packed into shared requests per model
+        (see plan_section_batches) before each section is consolidated on its own.
+        Returns {section_type: (model_outputs, final_output, final_time)}, as run_pipeline does
+        """
+        async with self.client.async_session() as http:
+            if not batch_sections:
+                outcomes = await asyncio.gather(*[
+                    self.run_pipeline(markdown_text, section_type, selected_models, use_cache, http=http)
+                    for section_type, markdown_text in sections.items()
+                ])
+                return dict(zip(sections, outcomes))
+            
+            batches = plan_section_batches(sections)
+            jobs = [(model, batch) for model in selected_models for batch in batches]
+            replies = await asyncio.gather(*[
+                self.aprocess_model_batch(http, model, {section_type: sections[section_type] for section_type in batch}, use_cache)
+                for model, batch in jobs
+            ])
+            
+            results = {section_type: {} for section_type in sections}
+            for (model, _), reply in zip(jobs, replies):
+                for section_type, (output, processing_time) in reply.items():
+                    results[section_type][model] = {
+                        'output': output,
+                        'time': processing_time
+                    }
+            
+            async def finalize(section_type):
+                model_results = {model: results[section_type][model] for model in selected_models}
+                markdown_text = sections[section_type]
+                final_output, final_time, consensus_model = await self.afinalize(
+                    http,
+                    markdown_text,
+                    section_type,
+                    {model: data['output'] for model, data in model_results.items()},
+                    use_cache
+                )
+                if consensus_model is not None:
+                    model_results[consensus_model]['consensus'] = True
+                return model_results, final_output, final_time
+            
+            outcomes = await asyncio.gather(*[finalize(section_type) for section_type in sections])
+        return dict(zip(sections, outcomes))
+
+
+def get_template_examples(section_type: str) -> Tuple[str, str]:
+    """Get template examples for the given section type"""
+    template_examples = load_template_examples()
+    if section_type in template_examples:
+        return (
+            template_examples[section_type]["general"],
+            template_examples[section_type]["sections"]
+        )
+    else:
+        # Fallback to Customer Discovery examples if section not found
+        return (
+            template_examples["Customer Discovery"]["general"],
+            template_examples["Customer Discovery"]["sections"]
+        )
+
+@functools.lru_cache(maxsize=32)
+def build_generation_system_prompt(section_type: str) -> str:
+    """The prompt-generation system prompt with the section's template examples, formatted once per section"""
+    general_example, sections_example = get_template_examples(section_type)
+    return PROMPT_GENERATION_SYSTEM_PROMPT.format(
+        section_type=section_type,
+        general_example=general_example,
+        sections_example=sections_example
+    )
+
+@functools.lru_cache(maxsize=32)
+def build_generation_final_prompt(section_type: str) -> str:
+    """The system prompt for consolidating generated prompts, formatted once per section"""
+    return PROMPT_GENERATION_FINAL_PROMPT.format(section_type=section_type)
 
 class PromptGenerator:
-    def __init__(self, client: OpenRouterClient):
+    def __init__(self, client: "OpenRouterClient"):
         self.client = client
     
     def get_template_examples(self, section_type: str) -> Tuple[str, str]:
         """Get template examples for the given section type"""
-        if section_type in TEMPLATE_EXAMPLES:
-            return (
-                TEMPLATE_EXAMPLES[section_type]["general"],
-                TEMPLATE_EXAMPLES[section_type]["sections"]
-            )
-        else:
-            # Fallback to Customer Discovery examples if section not found
-            return (
-                TEMPLATE_EXAMPLES["Customer Discovery"]["general"],
-                TEMPLATE_EXAMPLES["Customer Discovery"]["sections"]
-            )
+        return get_template_examples(section_type)
     
-    def generate_prompts_single_model(self, model: str, memo_text: str, section_type: str) -> Tuple[str, float]:
-        """Generate prompts using a single model and return result with timing"""
+    async def agenerate_prompts_single_model(self, http, model: str, memo_text: str, section_type: str, use_cache: bool = True) -> Tuple[str, float]:
+        """Generate prompts using a single model over the given HTTP client and return result with timing"""
         start_time = time.time()
         try:
-            # Get template examples
-            general_example, sections_example = self.get_template_examples(section_type)
-            
-            # Create the system prompt with examples
-            system_prompt = PROMPT_GENERATION_SYSTEM_PROMPT.format(
-                section_type=section_type,
-                general_example=general_example,
-                sections_example=sections_example
-            )
+            # The system prompt with the section's template examples, built once per section
+            system_prompt = build_generation_system_prompt(section_type)
             
-            response = self.client.generate_completion(
+            response = await self.client.agenerate_completion(
+                http,
                 model=model,
                 prompt=memo_text,
                 system_prompt=system_prompt,
-                max_tokens=4000
+                max_tokens=4000,
+                use_cache=use_cache
             )
             
             if 'choices' in response and len(response['choices']) > 0:
@@ -407,100 +956,125 @@ class PromptGenerator:
         processing_time = time.time() - start_time
         return result, processing_time
     
-    def generate_prompts_with_models(self, memo_text: str, section_type: str, selected_models: List[str] = None) -> Dict[str, Dict[str, Any]]:
+    def generate_prompts_single_model(self, model: str, memo_text: str, section_type: str, use_cache: bool = True) -> Tuple[str, float]:
+        """Synchronous wrapper around agenerate_prompts_single_model for callers without an event loop"""
+        async def run():
+            async with self.client.async_session() as http:
+                return await self.agenerate_prompts_single_model(http, model, memo_text, section_type, use_cache)
+        return asyncio.run(run())
+    
+    async def agenerate_prompts_with_models(self, memo_text: str, section_type: str, selected_models: Sequence[str] = REASONING_MODELS, use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
         """
-        Generate prompts through all reasoning models in parallel
+        Generate prompts through all reasoning models concurrently
         Returns a dictionary with model name as key and a dict with 'output' and 'time' as value
         """
-        if selected_models is None:
-            selected_models = REASONING_MODELS
+        # One HTTP client for the whole fan-out so every request shares its connection pool
+        async with self.client.async_session() as http:
+            outcomes = await asyncio.gather(
+                *[self.agenerate_prompts_single_model(http, model, memo_text, section_type, use_cache) for model in selected_models],
+                return_exceptions=True
+            )
         
-        # Use ThreadPoolExecutor for parallel processing
         results = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(selected_models), 6)) as executor:
-            # Create futures
-            future_to_model = {
-                executor.submit(self.generate_prompts_single_model, model, memo_text, section_type): model 
-                for model in selected_models
-            }
-            
-            # Process results as they complete
-            for future in concurrent.futures.as_completed(future_to_model):
-                model = future_to_model[future]
-                try:
-                    output, processing_time = future.result()
-                    results[model] = {
-                        'output': output,
-                        'time': processing_time
-                    }
-                except Exception as e:
-                    results[model] = {
-                        'output': f"Error: {str(e)}",
-                        'time': 0.0
-                    }
+        for model, outcome in zip(selected_models, outcomes):
+            if isinstance(outcome, Exception):
+                results[model] = {
+                    'output': f"Error: {str(outcome)}",
+                    'time': 0.0
+                }
+            else:
+                output, processing_time = outcome
+                results[model] = {
+                    'output': output,
+                    'time': processing_time
+                }
         
         return results
     
-    def create_final_prompts(self, original_text: str, model_outputs: Dict[str, Dict[str, Any]], section_type: str) -> Tuple[str, float]:
+    def generate_prompts_with_models(self, memo_text: str, section_type: str, selected_models: Sequence[str] = REASONING_MODELS, use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Synchronous wrapper around agenerate_prompts_with_models for callers without an event loop
+        """
+        return asyncio.run(self.agenerate_prompts_with_models(memo_text, section_type, selected_models, use_cache))
+    
+    async def acreate_final_prompts(self, original_text: str, model_outputs: Dict[str, Dict[str, Any]], section_type: str, use_cache: bool = True) -> Tuple[str, float]:
         """
         Create the final optimized prompts using all the model outputs
         Returns the final output and the processing time
         """
-        # Create prompt for the final model
-        combined_prompt = "ORIGINAL INVESTMENT MEMO SECTION:\n\n" + original_text + "\n\n"
+        # Create prompt for the final model as a list of parts joined once
+        prompt_parts = ["ORIGINAL INVESTMENT MEMO SECTION:\n\n", original_text, "\n\n"]
         
-        for model, output_data in model_outputs.items():
-            combined_prompt += f"PROMPTS GENERATED BY {model}:\n\n{output_data['output']}\n\n"
+        # Failed models are left out rather than shown to the final model as error strings
+        outputs = {model: output_data['output'] for model, output_data in model_outputs.items() if not is_error_output(output_data['output'])}
+        duplicates = find_duplicate_outputs(outputs)
+        for model, output in outputs.items():
+            if model in duplicates:
+                prompt_parts.extend(("PROMPTS GENERATED BY ", model, ": identical to those generated by ", duplicates[model], "\n\n"))
+            else:
+                prompt_parts.extend(("PROMPTS GENERATED BY ", model, ":\n\n", output, "\n\n"))
         
-        combined_prompt += f"Based on these versions, create the optimal final prompts that incorporate the best elements from each to create the most effective prompts for generating {section_type} content."
+        prompt_parts.append(f"Based on these versions, create the optimal final prompts that incorporate the best elements from each to create the most effective prompts for generating {section_type} content.")
+        combined_prompt = "".join(prompt_parts)
         
         start_time = time.time()
         
-        # Try multiple times with different approaches if network fails
-        for attempt in range(3):
-            try:
-                # Get the final system prompt with section type
-                final_system_prompt = PROMPT_GENERATION_FINAL_PROMPT.format(section_type=section_type)
-                
-                response = self.client.generate_completion(
-                    model=FINAL_MODEL,
-                    prompt=combined_prompt,
-                    system_prompt=final_system_prompt,
-                    max_tokens=4000
-                )
-                
-                if 'choices' in response and len(response['choices']) > 0:
-                    result = response['choices'][0]['message']['content']
-                    break
-                else:
-                    result = "Error: No content in response"
+        async with self.client.async_session() as http:
+            # Try multiple times with different approaches if network fails
+            for attempt in range(3):
+                try:
+                    # Get the final system prompt with section type
+                    final_system_prompt = build_generation_final_prompt(section_type)
+                    
+                    response = await self.client.agenerate_completion(
+                        http,
+                        model=FINAL_MODEL,
+                        prompt=combined_prompt,
+                        system_prompt=final_system_prompt,
+                        max_tokens=4000,
+                        use_cache=use_cache
+                    )
                     
-            except Exception as e:
-                error_msg = str(e)
-                if attempt < 2:  # Not the last attempt
-                    print(f"Attempt {attempt + 1} failed: {error_msg}. Retrying...")
-                    time.sleep(2)  # Wait 2 seconds before retry
-                    continue
-                else:
-                    # Last attempt failed - create a fallback response
-                    print(f"All attempts failed. Creating fallback response. Error: {error_msg}")
-                    result = self._create_fallback_final_prompts(model_outputs, section_type)
-                    break
+                    if 'choices' in response and len(response['choices']) > 0:
+                        result = response['choices'][0]['message']['content']
+                        break
+                    else:
+                        result = "Error: No content in response"
+                        
+                except Exception as e:
+                    error_msg = str(e)
+                    if attempt < 2:  # Not the last attempt
+                        print(f"Attempt {attempt + 1} failed: {error_msg}. Retrying...")
+                        await asyncio.sleep(2 * 2 ** attempt)  # Back off 2s, then 4s
+                        continue
+                    else:
+                        # Last attempt failed - create a fallback response
+                        print(f"All attempts failed. Creating fallback response. Error: {error_msg}")
+                        result = self._create_fallback_final_prompts(model_outputs, section_type)
+                        break
             
         # Calculate processing time in seconds
         processing_time = time.time() - start_time
         return result, processing_time
     
+    def create_final_prompts(self, original_text: str, model_outputs: Dict[str, Dict[str, Any]], section_type: str, use_cache: bool = True) -> Tuple[str, float]:
+        """
+        Synchronous wrapper around acreate_final_prompts for callers without an event loop
+        """
+        return asyncio.run(self.acreate_final_prompts(original_text, model_outputs, section_type, use_cache))
+    
     def _create_fallback_final_prompts(self, model_outputs: Dict[str, Dict[str, Any]], section_type: str) -> str:
         """
         Create a fallback final prompt when the API fails
         This combines the best elements from individual model outputs
         """
-        # Count common patterns and select the best elements
-        all_outputs = [output_data['output'] for output_data in model_outputs.values()]
-        
-        # Simple fallback: use the longest/most detailed output as base
-        best_output = max(all_outputs, key=len) if all_outputs else "Error: No model outputs available"
+        # Prefer real outputs over errors, then outputs in the expected two-prompt format,
+        # then the most detailed one by non-whitespace length; each output is scored once
+        scored = [
+            (not is_error_output(output), FINAL_PROMPTS_PATTERN.search(output) is not None, len(output) - output.count(" ") - output.count("\n"), output)
+            for output in (output_data['output'] for output_data in model_outputs.values())
+        ]
+        best_output = max(scored, default=(False, False, 0, "Error: No model outputs available"))[3]
         
         fallback_header = f"**FALLBACK RESPONSE - API CONNECTION FAILED**\n\n"
         fallback_header += f"Based on {len(model_outputs)} model outputs for {section_type}:\n\n"
@@ -512,20 +1086,9 @@ class PromptGenerator:
         Parse the final output to extract Chapter General Prompt and Section Instructions
         Returns (general_prompt, section_instructions)
         """
-        try:
-            # Split by the expected markers
-            if "**CHAPTER GENERAL PROMPT:**" in final_output and "**SECTION INSTRUCTIONS:**" in final_output:
-                parts = final_output.split("**CHAPTER GENERAL PROMPT:**")
-                if len(parts) > 1:
-                    remaining = parts[1]
-                    section_parts = remaining.split("**SECTION INSTRUCTIONS:**")
-                    if len(section_parts) > 1:
-                        general_prompt = section_parts[0].strip()
-                        section_instructions = section_parts[1].strip()
-                        return general_prompt, section_instructions
-            
-            # Fallback: return the whole output for both if parsing fails
-            return final_output, final_output
-            
-        except Exception as e:
-            return f"Error parsing output: {str(e)}", f"Error parsing output: {str(e)}" 
\ No newline at end of file
+        match = FINAL_PROMPTS_PATTERN.search(final_output)
+        if match:
+            return match.group(1).strip(), match.group(2).strip()
+        
+        # Fallback: return the whole output for both if parsing fails
+        return final_output, final_output 
\ No newline at end of file
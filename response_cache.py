@@ -0,0 +1,154 @@
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import orjson
+
+# Where the CLI keeps responses between runs
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "edit_max")
+
+# Mixed into every key; bump it to invalidate cached responses when the key or response format changes.
+# Prompt edits need no bump since the prompts themselves are part of the key
+CACHE_VERSION = 2
+
+# Seconds between sweeps of expired response files in a long-running process
+PRUNE_INTERVAL = 86400.0
+
+def normalize_prompt(text: str) -> str:
+    """Drop line-ending and trailing-whitespace differences that do not change what a model is asked"""
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+class ResponseCache:
+    def __init__(self, 
+                 max_entries: int = 256, 
+                 ttl: float = 3600.0, 
+                 cache_dir: Optional[str] = None,
+                 disk_ttl: float = 7 * 86400.0):
+        """
+        In-memory LRU cache of completion responses, optionally backed by one JSON file per response
+        
+        Args:
+            max_entries: Maximum number of responses kept before the least recently used is evicted
+            ttl: Seconds a cached response stays valid in memory
+            cache_dir: Directory for the on-disk tier; None keeps responses in memory only
+            disk_ttl: Seconds a response file stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.disk_ttl = disk_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[Any, Any]]]" = OrderedDict()
+        # The Streamlit app shares one client (and cache) between sessions running on different threads
+        self._lock = threading.Lock()
+        # Expired files are only removed when read again, so the directory is swept on startup
+        # and then at most once per PRUNE_INTERVAL by the writes of a long-running process
+        self._next_prune = 0.0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._prune_disk()
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: Optional[str], prompt: str, *params: Any) -> str:
+        """
+        Build the cache key as a SHA-256 digest of the model, the normalized prompts and
+        any sampling parameters (such as temperature and max_tokens) that change the response
+        """
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_VERSION}\x00{model}\x00{params!r}".encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(normalize_prompt(system_prompt or "").encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(normalize_prompt(prompt).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def _read_disk(self, key: str) -> Optional[Dict[Any, Any]]:
+        """Return the response stored on disk for a key, or None if missing, expired or unreadable"""
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.disk_ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+    
+    def _prune_disk(self) -> None:
+        """Delete response files older than disk_ttl, and temporary files left by interrupted writes"""
+        now = time.time()
+        self._next_prune = now + PRUNE_INTERVAL
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith((".json", ".tmp")):
+                        continue
+                    try:
+                        if now - entry.stat().st_mtime > self.disk_ttl:
+                            os.remove(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Error pruning cache directory {self.cache_dir}: {e}")
+    
+    def _write_disk(self, key: str, response: Dict[Any, Any]) -> None:
+        """Write a response file atomically so concurrent readers never see a partial file"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(response))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing cache file {path}: {e}")
+    
+    def get(self, key: str) -> Optional[Dict[Any, Any]]:
+        """Return the cached response for a key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, response = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return response
+                del self._entries[key]
+        
+        if not self.cache_dir:
+            return None
+        
+        # Fall back to the disk tier and promote hits into memory
+        response = self._read_disk(key)
+        if response is not None:
+            self._remember(key, response)
+        return response
+    
+    def _remember(self, key: str, response: Dict[Any, Any]) -> None:
+        """Store a response in memory, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def set(self, key: str, response: Dict[Any, Any]) -> None:
+        """Store a response in memory and, when enabled, on disk"""
+        self._remember(key, response)
+        if self.cache_dir:
+            self._write_disk(key, response)
+            if time.time() >= self._next_prune:
+                self._prune_disk()
+    
+    def clear(self) -> None:
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+        
+        if self.cache_dir:
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(".json"):
+                    os.remove(os.path.join(self.cache_dir, filename))
\ No newline at end of file
@@ -1,22 +1,87 @@
-import json
 import os
+import orjson
+import sqlite3
+import threading
 from datetime import datetime
 from typing import Dict, Optional, List, Any
 
 class LocalStorage:
     def __init__(self, storage_dir: str = "results"):
-        """Initialize storage with directory path"""
+        """Initialize storage with directory path and open the results database"""
         self.storage_dir = storage_dir
         os.makedirs(storage_dir, exist_ok=True)
+        
+        self.db_path = os.path.join(storage_dir, "results.db")
+        # The connection is shared by Streamlit's script threads, so every access goes through the lock
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        
+        # list_results is cached until the database or its write-ahead log changes on disk
+        self._list_cache_key = None
+        self._list_cache: List[str] = []
+        
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    section_type TEXT,
+                    original_snippet TEXT,
+                    data BLOB NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp)")
+            self._conn.commit()
+            
+            is_empty = self._conn.execute("SELECT 1 FROM results LIMIT 1").fetchone() is None
+        
+        if is_empty:
+            self._import_legacy_results()
+    
+    def _import_legacy_results(self) -> None:
+        """
+        Import results saved as one JSON file per result by earlier versions
+        The files are left in place; their filenames become the result IDs
+        """
+        rows = []
+        for filename in os.listdir(self.storage_dir):
+            if not filename.endswith('.json'):
+                continue
+            
+            filepath = os.path.join(self.storage_dir, filename)
+            try:
+                with open(filepath, 'rb') as f:
+                    data = orjson.loads(f.read())
+                rows.append(self._to_row(filename, data))
+            except Exception as e:
+                print(f"Error importing {filepath}: {e}")
+        
+        if rows:
+            with self._lock:
+                self._conn.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
     
-    def save_result(self, 
-                   original_text: str, 
-                   model_outputs: Dict[str, str], 
+    @staticmethod
+    def _to_row(result_id: str, data: Dict[str, Any]) -> tuple:
+        """Build the database row for a result"""
+        return (
+            result_id,
+            data.get("timestamp", ""),
+            data.get("section_type"),
+            (data.get("original_text") or "")[:200],
+            orjson.dumps(data)
+        )
+    
+    def save_result(self,
+                   original_text: str,
+                   model_outputs: Dict[str, str],
                    final_output: str,
                    processing_times: Dict[str, float] = None,
                    section_type: str = None) -> str:
         """
-        Save a result to local storage and return the file path
+        Save a result to local storage and return its ID
         
         Args:
             original_text: The original text that was processed
@@ -25,12 +90,13 @@ class LocalStorage:
             processing_times: Dictionary of processing times (model_name -> time in seconds)
             section_type: The type of memo section being edited
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"memo_edit_{timestamp}.json"
-        filepath = os.path.join(self.storage_dir, filename)
+        # One clock read, so the ID and the stored timestamp always agree; microseconds keep
+        # the IDs of back-to-back saves from different sessions apart
+        now = datetime.now()
+        result_id = f"memo_edit_{now.strftime('%Y%m%d_%H%M%S_%f')}.json"
         
         data = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "original_text": original_text,
             "model_outputs": model_outputs,
             "final_output": final_output
@@ -39,38 +105,58 @@ class LocalStorage:
         # Add processing times if provided
         if processing_times:
             data["processing_times"] = processing_times
-            
+        
         # Add section type if provided
         if section_type:
             data["section_type"] = section_type
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        return filepath
+        # A single-row insert takes well under a millisecond, so it is written before returning
+        # and a failed save raises in the caller that made it; a plain INSERT makes a duplicate
+        # ID fail with IntegrityError instead of silently replacing an earlier result
+        row = self._to_row(result_id, data)
+        with self._lock:
+            self._conn.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?)", row)
+            self._conn.commit()
+            # Two saves within one mtime tick would otherwise leave the cached list stale
+            self._list_cache_key = None
+        return result_id
     
-    def list_results(self) -> List[str]:
+    def list_results(self, limit: int = 100) -> List[str]:
         """
-        List all available result files
+        List the IDs of the most recent results
         """
-        if not os.path.exists(self.storage_dir):
-            return []
+        # Any write, from this process or another, touches the database or its -wal file
+        cache_key = (limit, self._mtime_ns(self.db_path), self._mtime_ns(self.db_path + "-wal"))
         
-        files = [f for f in os.listdir(self.storage_dir) if f.endswith('.json')]
-        return sorted(files, reverse=True)  # Most recent first
+        with self._lock:
+            if cache_key != self._list_cache_key:
+                rows = self._conn.execute(
+                    "SELECT id FROM results ORDER BY timestamp DESC LIMIT ?", (limit,)
+                ).fetchall()
+                self._list_cache = [row[0] for row in rows]  # Most recent first
+                self._list_cache_key = cache_key
+            return list(self._list_cache)
+    
+    @staticmethod
+    def _mtime_ns(path: str) -> int:
+        """Modification time of a file in nanoseconds, or 0 if it does not exist"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
     
-    def load_result(self, filename: str) -> Optional[Dict[str, Any]]:
+    def load_result(self, result_id: str) -> Optional[Dict[str, Any]]:
         """
-        Load a specific result by filename
+        Load a specific result by ID
         """
-        filepath = os.path.join(self.storage_dir, filename)
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM results WHERE id = ?", (result_id,)).fetchone()
         
-        if not os.path.exists(filepath):
+        if row is None:
             return None
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return orjson.loads(row[0])
         except Exception as e:
-            print(f"Error loading {filepath}: {e}")
-            return None 
\ No newline at end of file
+            print(f"Error loading {result_id}: {e}")
+            return None
\ No newline at end of file